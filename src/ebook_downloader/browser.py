@@ -2,8 +2,8 @@
 
 核心流程（基于实际抓包验证）：
 1. Playwright 打开城通网盘页面（触发 getfile.php 获取文件信息）
-2. 注册 response 监听
-3. 点击"普通下载·立即下载"按钮（触发 get_file_url.php → get_down_url.php）
+2. 点击"普通下载·立即下载"按钮（触发 get_file_url.php → get_down_url.php）
+3. 点击前注册 response 事件监听，收集上述 API 响应
 4. 从 get_file_url.php 或 get_down_url.php 响应 JSON 的 downurl 字段提取 CDN 直链
 
 实际 API 调用链：
@@ -13,20 +13,22 @@
 from __future__ import annotations
 
 import asyncio
-import json
 import logging
 import re
 from dataclasses import dataclass
 from urllib.parse import unquote
 
+import orjson
 from playwright.async_api import (
     Browser,
     BrowserContext,
     Page,
     Playwright,
     Response,
+    Route,
     async_playwright,
 )
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
 
 from .config import Config
 from .models import Book
@@ -43,6 +45,23 @@ class CDNResult:
     file_size: int = 0
 
 
+class InvalidLinkError(RuntimeError):
+    """书籍链接不是合法的 http(s) URL（数据源中的占位值，如 "链接未找到"）"""
+
+
+def _check_book_link(book: Book) -> None:
+    """书籍链接不是 http(s) URL 时抛出 InvalidLinkError（永久错误，无需打开浏览器）"""
+    if not book.link.startswith(("http://", "https://")):
+        raise InvalidLinkError(f"无效的书籍链接 ({book.title}): {book.link}")
+
+
+@dataclass
+class _ContextSlot:
+    """可复用的浏览器 Context 槽位，记录创建时使用的代理"""
+    context: BrowserContext | None = None
+    proxy_url: str | None = None
+
+
 class BrowserManager:
     """浏览器生命周期管理 + CDN 链接提取"""
 
@@ -51,7 +70,11 @@ class BrowserManager:
         self.proxy_pool = proxy_pool
         self._playwright: Playwright | None = None
         self._browser: Browser | None = None
-        self._semaphore = asyncio.Semaphore(config.browser_concurrency)
+        # Context 池：空闲槽位 + 准入控制（同时在用的槽位数不超过 _cap），Context 跨书籍复用
+        self._idle_slots: list[_ContextSlot] = []
+        self._active = 0
+        self._cap = config.browser_concurrency
+        self._admission = asyncio.Condition()
 
     async def start(self) -> None:
         """启动 Playwright 和浏览器实例"""
@@ -77,17 +100,92 @@ class BrowserManager:
     async def fetch_cdn_url(self, book: Book) -> CDNResult:
         """获取书籍的 CDN 下载链接
 
-        使用 Semaphore 控制并发 Context 数量。
-        获取链接后立即释放 Context，不阻塞后续任务。
+        从 Context 池取出一个槽位，限制并发 Context 数量。
+        获取链接后立即归还槽位，不阻塞后续任务。
         """
-        async with self._semaphore:
-            return await self._extract_cdn_url(book)
+        # 非法链接在占用槽位、获取代理之前直接拒绝
+        _check_book_link(book)
+        slot = await self._acquire_slot()
+        try:
+            return await self._extract_cdn_url(slot, book)
+        finally:
+            await self._release_slot(slot)
 
-    async def _extract_cdn_url(self, book: Book) -> CDNResult:
-        """在独立 Context 中提取 CDN 链接"""
+    async def set_concurrency(self, cap: int) -> None:
+        """运行时调整同时在用的 Context 上限（如代理池可用代理变少时调低）
+
+        调低时多余的空闲 Context 立即关闭，正在使用的槽位归还时再关闭；
+        调高后的实际并发仍受调用方 worker 数量限制。
+        """
+        cap = max(1, cap)
+        async with self._admission:
+            self._cap = cap
+            excess = max(0, len(self._idle_slots) + self._active - cap)
+            surplus = self._idle_slots[:excess]
+            del self._idle_slots[:excess]
+            self._admission.notify_all()
+        for slot in surplus:
+            await _close_slot(slot)
+        logger.info("浏览器并发上限调整为 %d", cap)
+
+    async def _acquire_slot(self) -> _ContextSlot:
+        """等待准入后取出空闲槽位（没有空闲槽位时新建空槽位）"""
+        async with self._admission:
+            await self._admission.wait_for(lambda: self._active < self._cap)
+            self._active += 1
+            return self._idle_slots.pop() if self._idle_slots else _ContextSlot()
+
+    async def _release_slot(self, slot: _ContextSlot) -> None:
+        """归还槽位；超出当前上限的槽位直接关闭其 Context"""
+        async with self._admission:
+            self._active -= 1
+            keep = len(self._idle_slots) + self._active < self._cap
+            if keep:
+                self._idle_slots.append(slot)
+            self._admission.notify()
+        if not keep:
+            await _close_slot(slot)
+
+    async def _extract_cdn_url(self, slot: _ContextSlot, book: Book) -> CDNResult:
+        """在槽位的 Context 中新开页面提取 CDN 链接"""
         if not self._browser:
             raise RuntimeError("浏览器未启动")
 
+        # 从代理池获取代理（代理仅用于浏览器访问 ctfile.com）
+        proxy_url = await self.proxy_pool.get_proxy() if self.proxy_pool else None
+        context = await self._ensure_context(slot, proxy_url)
+
+        try:
+            page = await context.new_page()
+        except Exception:
+            # Context 已不可用（如 Target closed），丢弃后由下次使用该槽位时重建
+            await _close_slot(slot)
+            raise
+        try:
+            return await self._navigate_and_extract(page, book)
+        finally:
+            try:
+                await page.close()
+            except Exception as e:
+                # Context 已不可用，下次使用该槽位时重建
+                logger.debug("关闭页面失败，丢弃 Context: %s", e)
+                await _close_slot(slot)
+
+    async def _ensure_context(
+        self, slot: _ContextSlot, proxy_url: str | None,
+    ) -> BrowserContext:
+        """复用槽位中的 Context；代理已切换或 Context 不存在时重建"""
+        if slot.context is not None and slot.proxy_url == proxy_url:
+            # 复用前清除 Cookie（localStorage 等站点存储不清除，跨书籍保留）
+            try:
+                await slot.context.clear_cookies()
+                return slot.context
+            except Exception as e:
+                # Context 已失效：丢弃并在下方重建，避免坏 Context 留在槽位里反复失败
+                logger.debug("复用 Context 失败，重建: %s", e)
+
+        await _close_slot(slot)
+
         # 构建 Context 参数
         context_kwargs: dict = {
             "user_agent": (
@@ -96,59 +194,53 @@ class BrowserManager:
                 "Chrome/120.0.0.0 Safari/537.36"
             ),
         }
-
-        # 从代理池获取代理（代理仅用于浏览器访问 ctfile.com）
-        if self.proxy_pool:
-            proxy_url = await self.proxy_pool.get_proxy()
-            if proxy_url:
-                context_kwargs["proxy"] = {"server": proxy_url}
-                logger.debug("Context 使用代理: %s", proxy_url)
+        if proxy_url:
+            context_kwargs["proxy"] = {"server": proxy_url}
+            logger.debug("Context 使用代理: %s", proxy_url)
 
         context = await self._browser.new_context(**context_kwargs)
-
-        try:
-            page = await context.new_page()
-            result = await self._navigate_and_extract(page, book)
-            return result
-        finally:
-            await context.close()
+        # 拦截图片/字体/媒体请求：提取 CDN 链接用不到，省带宽和渲染时间。
+        # 仅按 URL 扩展名匹配，文档、脚本和 API 请求由驱动端直接放行，不经过 Python
+        await context.route(_HEAVY_RESOURCE_URL_RE, _abort_route)
+        slot.context = context
+        slot.proxy_url = proxy_url
+        return context
 
     async def _navigate_and_extract(self, page: Page, book: Book) -> CDNResult:
-        """页面操作：打开链接 → 拦截 API → 点击下载 → 提取 CDN"""
+        """页面操作：打开链接 → 点击下载 → 等待 API 响应 → 提取 CDN"""
         timeout_ms = self.config.browser_timeout * 1000
 
-        # 存储拦截到的 CDN URL
-        cdn_future: asyncio.Future[CDNResult] = asyncio.get_running_loop().create_future()
-
-        async def on_response(response: Response) -> None:
-            """监听 API 响应，提取 CDN 链接"""
-            url = response.url
-            try:
-                # 拦截 get_file_url.php 或 get_down_url.php
-                if ("get_file_url" in url or "get_down_url" in url) and response.status == 200:
-                    body = await response.text()
-                    result = _parse_cdn_response(body)
-                    if result and not cdn_future.done():
-                        logger.debug("从 %s 获取到 CDN 链接", url.split("?")[0].split("/")[-1])
-                        cdn_future.set_result(result)
-            except Exception as e:
-                logger.debug("处理响应失败 (%s): %s", url[:80], e)
-
-        page.on("response", on_response)
-
         try:
             # 导航到下载页面
             logger.debug("正在打开: %s (%s)", book.title, book.link)
             await page.goto(book.link, wait_until="domcontentloaded", timeout=timeout_ms)
 
-            # 等待页面完全加载（城通网盘是 SPA，需要等 JS 渲染）
-            await page.wait_for_load_state("networkidle", timeout=timeout_ms)
+            # 等待下载按钮渲染（城通网盘是 SPA，需要等 JS 渲染）
+            # 不等 networkidle：广告请求会使其拖满超时，真正的完成信号是 API 响应
+            try:
+                await page.wait_for_selector(_DOWNLOAD_BUTTON_SELECTOR, timeout=5000)
+            except PlaywrightTimeoutError:
+                logger.debug("等待下载按钮超时，继续尝试点击: %s", book.title)
 
-            # 点击"普通下载·立即下载"按钮
-            await self._click_download_button(page)
+            # 点击"普通下载·立即下载"按钮，收集 get_file_url / get_down_url 响应。
+            # 监听在点击前注册、直到取得结果才移除：读取响应体期间到达的后续
+            # 响应也会进入队列，不会错过；点击与全部等待共用同一个截止时间
+            deadline = asyncio.get_running_loop().time() + self.config.browser_timeout
+            responses: asyncio.Queue[Response] = asyncio.Queue()
+
+            def on_response(response: Response) -> None:
+                if _is_cdn_api_response(response):
+                    responses.put_nowait(response)
+
+            page.on("response", on_response)
+            try:
+                await self._click_download_button(page)
+                result = await self._read_cdn_result(responses, deadline)
+            except PlaywrightTimeoutError as e:
+                raise asyncio.TimeoutError from e
+            finally:
+                page.remove_listener("response", on_response)
 
-            # 等待 CDN URL 被拦截
-            result = await asyncio.wait_for(cdn_future, timeout=self.config.browser_timeout)
             logger.info("获取CDN链接: %s → %s", book.title, result.url[:100])
             return result
 
@@ -161,36 +253,73 @@ class BrowserManager:
                 logger.info("代理连接失败，已触发切换: %s", e)
             raise RuntimeError(f"获取 CDN 链接失败 ({book.title}): {e}") from e
 
+    async def _read_cdn_result(
+        self, responses: asyncio.Queue[Response], deadline: float,
+    ) -> CDNResult:
+        """依次解析收集到的 API 响应，直到取得 CDN 链接或到达截止时间"""
+        loop = asyncio.get_running_loop()
+
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                raise asyncio.TimeoutError
+            response = await asyncio.wait_for(responses.get(), remaining)
+            try:
+                # 直接取原始字节交给 orjson，省去一次 UTF-8 解码；读取同样受截止时间约束
+                body = await asyncio.wait_for(
+                    response.body(), max(0.0, deadline - loop.time()),
+                )
+                result = _parse_cdn_response(body)
+            except asyncio.TimeoutError:
+                raise
+            except Exception as e:
+                # 页面跳转后响应体可能已不可读（No resource with given identifier），继续等待后续响应
+                logger.debug("读取 API 响应失败: %s", e)
+                continue
+            if result:
+                logger.debug(
+                    "从 %s 获取到 CDN 链接", response.url.split("?")[0].split("/")[-1],
+                )
+                return result
+
     async def _click_download_button(self, page: Page) -> None:
         """点击"普通下载·立即下载"按钮
 
-        基于实际页面结构，按优先级尝试多种选择器。
+        基于实际页面结构，按优先级在页面内一次性查找可见按钮（单次 IPC）；
+        页面内查找不到时，回退到 Playwright locator 逐个尝试（带可操作性等待）。
         城通网盘页面结构：#freeDownloadNormal 区域内的 button
         """
-        # 按优先级排列的选择器策略
-        strategies = [
-            # 策略1: 城通网盘特有的普通下载区域按钮（最精确）
-            ('#freeDownloadNormal button:has-text("立即下载")', "freeDownloadNormal button"),
-            # 策略2: 第一个"立即下载"按钮
-            ('button:has-text("立即下载")', "first button with 立即下载"),
-            # 策略3: 包含"立即下载"的链接
-            ('a:has-text("立即下载")', "first link with 立即下载"),
-        ]
-
-        for selector, desc in strategies:
+        handle = None
+        try:
+            handle = await page.evaluate_handle(_FIND_DOWNLOAD_BUTTON_JS)
+            el = handle.as_element()
+            if el is not None:
+                await el.click(timeout=5000)
+                logger.debug("点击按钮成功")
+                return
+        except Exception as e:
+            logger.debug("点击下载按钮失败: %s", e)
+        finally:
+            if handle is not None:
+                try:
+                    await handle.dispose()
+                except Exception as e:
+                    logger.debug("释放按钮句柄失败: %s", e)
+
+        # 回退：按优先级用 locator 查找并点击
+        for selector, desc in _DOWNLOAD_BUTTON_LOCATORS:
             try:
                 el = page.locator(selector).first
-                if await el.is_visible(timeout=3000):
+                if await el.is_visible():
                     await el.click(timeout=5000)
                     logger.debug("点击按钮成功: %s", desc)
                     return
             except Exception:
                 continue
 
-        # 最后兜底：点击任何包含"下载"文字的按钮
+        # 最后兜底：按无障碍角色匹配"立即下载"按钮
         try:
-            el = page.get_by_role("button", name="立即下载").first
-            await el.click(timeout=5000)
+            await page.get_by_role("button", name="立即下载").first.click(timeout=5000)
             logger.debug("通过 role 匹配点击按钮")
             return
         except Exception:
@@ -212,7 +341,66 @@ class BrowserManager:
         raise RuntimeError("未找到下载按钮")
 
 
-def _parse_cdn_response(body: str) -> CDNResult | None:
+# 页面加载时直接中止的静态资源 URL：图片/字体/媒体（保留 CSS：按钮可见性依赖样式）
+_HEAVY_RESOURCE_URL_RE = re.compile(
+    r"^[^?#]*\.(?:png|jpe?g|gif|webp|svg|ico|woff2?|ttf|otf|mp4|webm|mp3)(?:[?#]|$)",
+    re.IGNORECASE,
+)
+
+
+async def _close_slot(slot: _ContextSlot) -> None:
+    """关闭并清空槽位持有的 Context（失败仅记录，不影响调用方）"""
+    context, slot.context, slot.proxy_url = slot.context, None, None
+    if context is None:
+        return
+    try:
+        await context.close()
+    except Exception as e:
+        logger.debug("关闭 Context 失败: %s", e)
+
+
+async def _abort_route(route: Route) -> None:
+    """context.route 处理器：中止匹配到的静态资源请求"""
+    await route.abort()
+
+
+# 下载按钮出现即视为页面已渲染完成
+_DOWNLOAD_BUTTON_SELECTOR = (
+    '#freeDownloadNormal button, button:has-text("立即下载"), a:has-text("立即下载")'
+)
+
+# 页面内查找失败时的 locator 回退策略（选择器, 描述），按优先级排列
+_DOWNLOAD_BUTTON_LOCATORS = (
+    ('#freeDownloadNormal button:has-text("立即下载")', "freeDownloadNormal button"),
+    ('button:has-text("立即下载")', "first button with 立即下载"),
+    ('a:has-text("立即下载")', "first link with 立即下载"),
+)
+
+# 按优先级查找第一个可见的"立即下载"按钮：
+# 1. 城通网盘特有的普通下载区域按钮（最精确）
+# 2. 第一个"立即下载"按钮
+# 3. 包含"立即下载"的链接
+_FIND_DOWNLOAD_BUTTON_JS = """() => {
+    const selectors = ["#freeDownloadNormal button", "button", "a"];
+    for (const sel of selectors) {
+        for (const el of document.querySelectorAll(sel)) {
+            // getClientRects 对 position: fixed 元素同样有效（其 offsetParent 为 null）
+            if (el.getClientRects().length > 0 && el.textContent.includes("立即下载")) {
+                return el;
+            }
+        }
+    }
+    return null;
+}"""
+
+
+def _is_cdn_api_response(response: Response) -> bool:
+    """是否为携带 CDN 链接的 API 响应（get_file_url.php / get_down_url.php）"""
+    url = response.url
+    return ("get_file_url" in url or "get_down_url" in url) and response.status == 200
+
+
+def _parse_cdn_response(body: bytes) -> CDNResult | None:
     """解析 get_file_url.php / get_down_url.php 返回的 JSON
 
     已验证的响应格式：
@@ -225,8 +413,8 @@ def _parse_cdn_response(body: str) -> CDNResult | None:
     }
     """
     try:
-        data = json.loads(body)
-    except json.JSONDecodeError:
+        data = orjson.loads(body)
+    except orjson.JSONDecodeError:
         return None
 
     if not isinstance(data, dict):
@@ -246,10 +434,14 @@ def _parse_cdn_response(body: str) -> CDNResult | None:
     # 提取文件名：优先用 API 返回的 file_name
     filename = data.get("file_name", "")
     if not filename:
-        # 从 URL 的 fname 参数提取
-        fname_match = re.search(r'fname=([^&]+)', cdn_url)
-        if fname_match:
-            filename = unquote(fname_match.group(1))
+        # 从 URL 的 fname 参数提取（str.find 即可，无需正则）
+        fname = ""
+        start = cdn_url.find("fname=")
+        if start >= 0:
+            end = cdn_url.find("&", start)
+            fname = cdn_url[start + 6:end if end >= 0 else None]
+        if fname:
+            filename = unquote(fname)
         else:
             # 从 URL 路径提取
             filename = cdn_url.split("/")[-1].split("?")[0]
@@ -274,7 +466,13 @@ _PROXY_ERROR_PATTERNS = (
 )
 
 
+# 所有特征词编译为一个交替正则，单次扫描完成匹配
+_PROXY_ERROR_RE = re.compile("|".join(map(re.escape, _PROXY_ERROR_PATTERNS)))
+
+
 def _is_proxy_error(exc: Exception) -> bool:
-    """判断异常是否为代理连接级错误"""
-    msg = str(exc).upper()
-    return any(pattern in msg for pattern in _PROXY_ERROR_PATTERNS)
+    """判断异常是否为代理连接级错误
+
+    Chromium 的 net::ERR_* 错误码本身即为大写，直接按原文匹配，无需 upper() 复制。
+    """
+    return _PROXY_ERROR_RE.search(str(exc)) is not None
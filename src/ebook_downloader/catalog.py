@@ -2,17 +2,27 @@
 
 from __future__ import annotations
 
-import json
 import logging
+import pickle
+from collections import Counter
+from collections.abc import Iterable
+from itertools import islice
 from pathlib import Path
 
 import httpx
+import orjson
 
 from .config import Config
 from .models import Book
 
 logger = logging.getLogger(__name__)
 
+# 解析缓存格式版本（Book 结构变化时递增，使旧缓存失效）
+_CACHE_VERSION = 5
+
+# 数据源下载块大小
+_CATALOG_CHUNK_SIZE = 64 * 1024  # 64KB
+
 
 class Catalog:
     """书籍目录管理"""
@@ -20,41 +30,90 @@ class Catalog:
     def __init__(self, config: Config) -> None:
         self.config = config
         self._books: list[Book] = []
+        # 列式索引：与 _books 按下标一一对应，加载时一次性构建，供 filter() 使用
+        self._categories: list[str] = []
+        self._titles_lc: list[str] = []
+        self._authors_lc: list[str] = []
 
     @property
     def books(self) -> list[Book]:
         if not self._books:
             self._books = self._load()
+            self._build_index()
         return self._books
 
+    def _build_index(self) -> None:
+        """构建筛选用的列式索引（分类、小写标题、小写作者）"""
+        books = self._books
+        self._categories = [b.category for b in books]
+        self._titles_lc = [b.title_lower for b in books]
+        self._authors_lc = [b.author_lower for b in books]
+
     def _load(self) -> list[Book]:
-        """从本地 JSON 加载书籍列表"""
+        """从本地 JSON 加载书籍列表（优先使用解析缓存）"""
         path = self.config.catalog_path
         if not path.exists():
             logger.error("数据文件不存在: %s，请先运行 fetch-data", path)
             return []
 
-        with open(path, "r", encoding="utf-8") as f:
-            raw = json.load(f)
+        # 缓存以数据文件的 (mtime_ns, size) 为键，二者一致时直接复用
+        st = path.stat()
+        source_key = (st.st_mtime_ns, st.st_size)
+
+        books = self._load_cache(source_key)
+        if books is not None:
+            logger.info("加载 %d 本书籍 (缓存)", len(books))
+            return books
 
+        raw = orjson.loads(path.read_bytes())
+
+        from_dict = Book.from_dict
         books = []
+        append = books.append
         for item in raw:
             try:
-                book = Book.from_dict(item)
-                if book.title and book.link:
-                    books.append(book)
+                book = from_dict(item)
             except Exception as e:
                 logger.warning("解析书籍记录失败: %s", e)
+                continue
+            if book.title and book.link:
+                append(book)
 
+        self._save_cache(source_key, books)
         logger.info("加载 %d 本书籍", len(books))
         return books
 
+    def _load_cache(self, source_key: tuple[int, int]) -> list[Book] | None:
+        """读取解析缓存；缓存不存在、数据文件已变化或格式不符时返回 None"""
+        try:
+            version, key, books = pickle.loads(
+                self.config.catalog_cache_path.read_bytes(),
+            )
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.debug("读取目录缓存失败，重新解析: %s", e)
+            return None
+        if version != _CACHE_VERSION or tuple(key) != source_key:
+            return None
+        return books
+
+    def _save_cache(self, source_key: tuple[int, int], books: list[Book]) -> None:
+        """写入解析缓存（先写临时文件再替换，失败不影响主流程）"""
+        cache = self.config.catalog_cache_path
+        tmp = cache.with_suffix(cache.suffix + ".tmp")
+        try:
+            payload = (_CACHE_VERSION, source_key, books)
+            tmp.write_bytes(pickle.dumps(payload, protocol=5))
+            tmp.replace(cache)
+        except Exception as e:
+            logger.debug("写入目录缓存失败: %s", e)
+            tmp.unlink(missing_ok=True)
+
     def categories(self) -> dict[str, int]:
         """返回所有分类及对应数量，按数量降序"""
-        counts: dict[str, int] = {}
-        for book in self.books:
-            counts[book.category] = counts.get(book.category, 0) + 1
-        return dict(sorted(counts.items(), key=lambda x: x[1], reverse=True))
+        counts = Counter(book.category for book in self.books)
+        return dict(counts.most_common())
 
     def filter(
         self,
@@ -64,27 +123,27 @@ class Catalog:
         limit: int | None = None,
     ) -> list[Book]:
         """按分类和/或关键词筛选书籍"""
-        result = self.books
+        books = self.books
+        cats = self._categories
+        idx: Iterable[int] = range(len(books))
 
         if categories:
             cat_set = set(categories)
-            result = [b for b in result if b.category in cat_set]
+            idx = (i for i in idx if cats[i] in cat_set)
 
         if exclude_categories:
             exc_set = set(exclude_categories)
-            result = [b for b in result if b.category not in exc_set]
+            idx = (i for i in idx if cats[i] not in exc_set)
 
         if keyword:
             kw = keyword.lower()
-            result = [
-                b for b in result
-                if kw in b.title.lower() or kw in b.author.lower()
-            ]
+            titles, authors = self._titles_lc, self._authors_lc
+            idx = (i for i in idx if kw in titles[i] or kw in authors[i])
 
         if limit is not None and limit > 0:
-            result = result[:limit]
+            idx = islice(idx, limit)
 
-        return result
+        return [books[i] for i in idx]
 
 
 async def fetch_catalog(config: Config) -> Path:
@@ -93,12 +152,22 @@ async def fetch_catalog(config: Config) -> Path:
     target = config.catalog_path
 
     logger.info("正在从 %s 下载数据...", config.data_url)
-    async with httpx.AsyncClient(timeout=60, follow_redirects=True) as client:
-        resp = await client.get(config.data_url)
-        resp.raise_for_status()
+    # 流式写入临时文件，避免整份 JSON 在内存中驻留多份；校验通过后再替换正式文件
+    part_file = target.with_suffix(target.suffix + ".part")
+    try:
+        async with httpx.AsyncClient(timeout=60, follow_redirects=True) as client:
+            async with client.stream("GET", config.data_url) as resp:
+                resp.raise_for_status()
+                with open(part_file, "wb") as f:
+                    async for chunk in resp.aiter_bytes(_CATALOG_CHUNK_SIZE):
+                        f.write(chunk)
+
+        # 验证 JSON 有效性
+        data = orjson.loads(part_file.read_bytes())
+        part_file.replace(target)
+    except BaseException:
+        part_file.unlink(missing_ok=True)
+        raise
 
-    target.write_bytes(resp.content)
-    # 验证 JSON 有效性
-    data = json.loads(resp.content)
     logger.info("下载完成，共 %d 条记录，保存至 %s", len(data), target)
     return target
@@ -6,13 +6,11 @@ import argparse
 import asyncio
 import logging
 import sys
+from typing import Callable
 
 from .catalog import Catalog, fetch_catalog
 from .config import Config, load_config
-from .browser import BrowserManager
 from .models import DownloadStatus
-from .proxy import ProxyPool
-from .scheduler import Scheduler
 from .state import StateDB
 from .utils import (
     DownloadProgressManager,
@@ -24,24 +22,7 @@ from .utils import (
 logger = logging.getLogger(__name__)
 
 
-def build_parser() -> argparse.ArgumentParser:
-    parser = argparse.ArgumentParser(
-        prog="ebook-downloader",
-        description="城通网盘电子书批量下载工具",
-    )
-    parser.add_argument(
-        "--config", "-C", type=str, default=None,
-        help="配置文件路径 (默认: config.yaml)",
-    )
-    parser.add_argument(
-        "--verbose", "-v", action="store_true",
-        help="启用详细日志",
-    )
-
-    sub = parser.add_subparsers(dest="command", help="可用命令")
-
-    # download
-    dl = sub.add_parser("download", help="下载电子书")
+def _add_download_args(dl: argparse.ArgumentParser) -> None:
     dl.add_argument(
         "-c", "--categories", nargs="+", default=None,
         help="按分类筛选（可指定多个）",
@@ -87,8 +68,8 @@ def build_parser() -> argparse.ArgumentParser:
         help="本地代理文件路径（每行一个 ip:port，与 --proxy-api 互斥）",
     )
 
-    # list
-    ls = sub.add_parser("list", help="列出书籍/分类")
+
+def _add_list_args(ls: argparse.ArgumentParser) -> None:
     ls.add_argument(
         "--categories", action="store_true",
         help="列出所有分类",
@@ -106,11 +87,8 @@ def build_parser() -> argparse.ArgumentParser:
         help="显示条数 (默认: 20)",
     )
 
-    # status
-    sub.add_parser("status", help="查看下载统计")
 
-    # retry
-    rt = sub.add_parser("retry", help="重试所有失败项")
+def _add_retry_args(rt: argparse.ArgumentParser) -> None:
     rt.add_argument(
         "--proxy-api", type=str, default=None,
         help="代理池 API 地址（如 https://dps.kdlapi.com/api/getdps/...）",
@@ -124,15 +102,73 @@ def build_parser() -> argparse.ArgumentParser:
         help="显示浏览器窗口（调试用）",
     )
 
-    # fetch-data
-    sub.add_parser("fetch-data", help="下载/更新 all-books.json 数据源")
+
+# 子命令表：名称 → (帮助信息, 参数构建函数)
+_COMMANDS: dict[str, tuple[str, Callable[[argparse.ArgumentParser], None] | None]] = {
+    "download": ("下载电子书", _add_download_args),
+    "list": ("列出书籍/分类", _add_list_args),
+    "status": ("查看下载统计", None),
+    "retry": ("重试所有失败项", _add_retry_args),
+    "fetch-data": ("下载/更新 all-books.json 数据源", None),
+}
+
+
+def _peek_command(argv: list[str]) -> str | None:
+    """在完整解析前找出要执行的子命令
+
+    只识别全局选项的标准写法（--config/-C 及其取值、--config=值、-C值、
+    --verbose/-v）。遇到其他写法（如合并短选项 -vC、前缀缩写 --conf）时
+    无法确定取值归属，返回 None，由调用方为所有子命令构建参数。
+    """
+    it = iter(argv)
+    for arg in it:
+        if arg in ("--config", "-C"):
+            next(it, None)
+        elif arg in ("--verbose", "-v") or arg.startswith(("--config=", "-C")):
+            continue
+        elif arg in _COMMANDS:
+            return arg
+        else:
+            return None
+    return None
+
+
+def build_parser(argv: list[str] | None = None) -> argparse.ArgumentParser:
+    """构建命令行解析器
+
+    所有子命令都会注册（保证 --help 列表完整），但能确定即将执行的子命令时
+    只为它构建完整参数，避免每次启动都构造全部选项；无法确定时构建全部。
+    """
+    if argv is None:
+        argv = sys.argv[1:]
+    selected = _peek_command(argv)
+
+    parser = argparse.ArgumentParser(
+        prog="ebook-downloader",
+        description="城通网盘电子书批量下载工具",
+    )
+    parser.add_argument(
+        "--config", "-C", type=str, default=None,
+        help="配置文件路径 (默认: config.yaml)",
+    )
+    parser.add_argument(
+        "--verbose", "-v", action="store_true",
+        help="启用详细日志",
+    )
+
+    sub = parser.add_subparsers(dest="command", help="可用命令")
+    for name, (help_text, add_args) in _COMMANDS.items():
+        cmd = sub.add_parser(name, help=help_text)
+        if add_args is not None and selected in (None, name):
+            add_args(cmd)
 
     return parser
 
 
 def main() -> None:
-    parser = build_parser()
-    args = parser.parse_args()
+    argv = sys.argv[1:]
+    parser = build_parser(argv)
+    args = parser.parse_args(argv)
 
     if not args.command:
         parser.print_help()
@@ -172,6 +208,11 @@ async def _dispatch(args: argparse.Namespace, config: Config) -> None:
 
 async def _cmd_download(args: argparse.Namespace, config: Config) -> None:
     """执行下载"""
+    # 延迟导入：playwright 等重依赖仅 download 命令需要
+    from .browser import BrowserManager
+    from .proxy import ProxyPool
+    from .scheduler import Scheduler
+
     # 覆盖配置
     if args.output_dir:
         config.download_dir = args.output_dir
@@ -223,18 +264,20 @@ async def _cmd_download(args: argparse.Namespace, config: Config) -> None:
     browser = BrowserManager(config, proxy_pool=proxy_pool)
     await browser.start()
 
-    try:
-        progress = DownloadProgressManager()
-        scheduler = Scheduler(config, state, browser, progress)
+    progress = DownloadProgressManager()
 
-        with progress:
-            stats = await scheduler.run(books)
+    try:
+        async with Scheduler(config, state, browser, progress) as scheduler:
+            with progress:
+                stats = await scheduler.run(books)
 
         console.print()
         print_stats_table(stats, await state.total_size())
 
     finally:
         await browser.stop()
+        if proxy_pool:
+            await proxy_pool.aclose()
         await state.close()
 
 
@@ -8,13 +8,19 @@ from pathlib import Path
 
 import yaml
 
+# 优先使用 libyaml 的 C 实现，未编译 libyaml 时回退纯 Python 版本
+_YamlLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
 
-@dataclass
+# 启动时的工作目录，只查询一次（CLI 运行期间不会切换目录）
+_CWD = Path.cwd()
+
+
+@dataclass(slots=True)
 class Config:
     """应用配置，支持 YAML 文件加载和默认值"""
 
     # 路径配置
-    project_root: Path = field(default_factory=lambda: Path.cwd())
+    project_root: Path = field(default_factory=lambda: _CWD)
     download_dir: str = "downloads"
     data_dir: str = "data"
     log_dir: str = "logs"
@@ -40,6 +46,7 @@ class Config:
     # 重试
     max_retries: int = 3
     retry_backoff: int = 5
+    retry_backoff_cap: int = 30  # 单次退避上限（秒），实际等待在此基础上 ±50% 抖动
 
     # 浏览器
     headless: bool = True
@@ -83,6 +90,10 @@ class Config:
     def catalog_path(self) -> Path:
         return self.data_path / "all-books.json"
 
+    @property
+    def catalog_cache_path(self) -> Path:
+        return self.data_path / "all-books.pkl"
+
     def ensure_dirs(self) -> None:
         """创建必要的目录"""
         self.download_path.mkdir(parents=True, exist_ok=True)
@@ -96,7 +107,7 @@ def load_config(config_path: str | Path | None = None) -> Config:
         # 尝试从项目根目录加载
         candidates = ["config.yaml", "config.yml"]
         for name in candidates:
-            p = Path.cwd() / name
+            p = _CWD / name
             if p.exists():
                 config_path = p
                 break
@@ -105,7 +116,7 @@ def load_config(config_path: str | Path | None = None) -> Config:
         path = Path(config_path)
         if path.exists():
             with open(path, "r", encoding="utf-8") as f:
-                data = yaml.safe_load(f) or {}
+                data = yaml.load(f, Loader=_YamlLoader) or {}
             # 过滤掉 Config 不接受的字段
             valid_fields = {f.name for f in Config.__dataclass_fields__.values()}
             filtered = {k: v for k, v in data.items() if k in valid_fields}
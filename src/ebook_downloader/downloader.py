@@ -2,8 +2,9 @@
 
 from __future__ import annotations
 
+import asyncio
 import logging
-import os
+import shutil
 import zipfile
 from pathlib import Path
 from typing import Callable
@@ -17,30 +18,56 @@ logger = logging.getLogger(__name__)
 # 进度回调类型: (downloaded_bytes, total_bytes, chunk_bytes)
 ProgressCallback = Callable[[int, int, int], None] | None
 
-# 下载块大小
-CHUNK_SIZE = 64 * 1024  # 64KB
+# 下载块大小（每块一次线程池写入和一次进度回调，块过小时调度开销占比过高）
+CHUNK_SIZE = 1024 * 1024  # 1MB
 
 
 class FileTooLargeError(Exception):
     """文件超过大小上限"""
 
 
+class CDNExpiredError(Exception):
+    """CDN 链接已过期（HTTP 403/404/410），需重新获取链接"""
+
+
+# 表示 CDN 链接过期的 HTTP 状态码
+_CDN_EXPIRED_STATUS = frozenset({403, 404, 410})
+
+
+def create_download_client(config: Config) -> httpx.AsyncClient:
+    """创建下载用的 HTTP 客户端，由调用方在多次下载间共享以复用连接
+
+    连接池按下载并发数设置：每个消费者同一时间只占用一个连接，
+    额外余量留给重定向，空闲连接保留给后续下载复用。
+    """
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(config.download_timeout, connect=30),
+        limits=httpx.Limits(
+            max_connections=config.download_concurrency * 2,
+            max_keepalive_connections=config.download_concurrency,
+        ),
+        follow_redirects=True,
+    )
+
+
 async def download_file(
+    client: httpx.AsyncClient,
     url: str,
     dest: Path,
     config: Config,
     progress_cb: ProgressCallback = None,
-) -> Path:
+) -> tuple[Path, int]:
     """异步流式下载文件，支持断点续传
 
     Args:
+        client: 共享的 HTTP 客户端（见 create_download_client）
         url: CDN 下载链接
         dest: 目标文件路径
         config: 应用配置
         progress_cb: 进度回调函数
 
     Returns:
-        下载完成的文件路径
+        (下载完成的文件路径, 文件大小)
     """
     dest.parent.mkdir(parents=True, exist_ok=True)
     part_file = dest.with_suffix(dest.suffix + ".part")
@@ -60,57 +87,56 @@ async def download_file(
         headers["Range"] = f"bytes={downloaded}-"
         logger.debug("断点续传: %s (已下载 %d 字节)", dest.name, downloaded)
 
-    async with httpx.AsyncClient(
-        timeout=httpx.Timeout(config.download_timeout, connect=30),
-        follow_redirects=True,
-    ) as client:
-        async with client.stream("GET", url, headers=headers) as response:
-            # 处理 Range 响应
-            if response.status_code == 416:
-                # Range Not Satisfiable — 文件可能已完整
-                if part_file.exists():
-                    part_file.rename(dest)
-                    return dest
-                raise httpx.HTTPStatusError(
-                    "Range request failed",
-                    request=response.request,
-                    response=response,
+    async with client.stream("GET", url, headers=headers) as response:
+        # 处理 Range 响应
+        if response.status_code == 416:
+            # Range Not Satisfiable — 文件可能已完整
+            if part_file.exists():
+                part_file.rename(dest)
+                return dest, downloaded
+            raise httpx.HTTPStatusError(
+                "Range request failed",
+                request=response.request,
+                response=response,
+            )
+
+        if response.status_code in _CDN_EXPIRED_STATUS:
+            raise CDNExpiredError(f"CDN 链接已过期 (HTTP {response.status_code})")
+        response.raise_for_status()
+
+        # 获取总大小
+        if response.status_code == 206:
+            # 部分内容响应
+            content_range = response.headers.get("content-range", "")
+            total = int(content_range.split("/")[-1]) if "/" in content_range else 0
+        else:
+            total = int(response.headers.get("content-length", 0))
+            # 非 206 响应意味着服务器不支持 Range，需从头开始
+            if downloaded > 0:
+                downloaded = 0
+
+        mode = "ab" if response.status_code == 206 else "wb"
+
+        # 文件大小上限检查（仅读 Header，不浪费带宽）
+        if config.max_file_size > 0 and total > 0:
+            max_bytes = config.max_file_size * 1024 * 1024
+            if total > max_bytes:
+                raise FileTooLargeError(
+                    f"文件大小 {_format_size(total)} 超过上限 {config.max_file_size}MB"
                 )
 
-            response.raise_for_status()
-
-            # 获取总大小
-            if response.status_code == 206:
-                # 部分内容响应
-                content_range = response.headers.get("content-range", "")
-                total = int(content_range.split("/")[-1]) if "/" in content_range else 0
-            else:
-                total = int(response.headers.get("content-length", 0))
-                # 非 206 响应意味着服务器不支持 Range，需从头开始
-                if downloaded > 0:
-                    downloaded = 0
-
-            mode = "ab" if response.status_code == 206 else "wb"
-
-            # 文件大小上限检查（仅读 Header，不浪费带宽）
-            if config.max_file_size > 0 and total > 0:
-                max_bytes = config.max_file_size * 1024 * 1024
-                if total > max_bytes:
-                    raise FileTooLargeError(
-                        f"文件大小 {_format_size(total)} 超过上限 {config.max_file_size}MB"
-                    )
-
-            with open(part_file, mode) as f:
-                async for chunk in response.aiter_bytes(CHUNK_SIZE):
-                    f.write(chunk)
-                    downloaded += len(chunk)
-                    if progress_cb:
-                        progress_cb(downloaded, total, len(chunk))
+        with open(part_file, mode) as f:
+            async for chunk in response.aiter_bytes(CHUNK_SIZE):
+                # 磁盘写入放到线程池，避免阻塞事件循环上的其他下载
+                await asyncio.to_thread(f.write, chunk)
+                downloaded += len(chunk)
+                if progress_cb:
+                    progress_cb(downloaded, total, len(chunk))
 
     # 下载完成，重命名
     part_file.rename(dest)
     logger.info("下载完成: %s (%s)", dest.name, _format_size(downloaded))
-    return dest
+    return dest, downloaded
 
 
 def _format_size(size: int) -> str:
@@ -125,9 +151,15 @@ def _format_size(size: int) -> str:
 # ZIP 内的电子书扩展名
 EBOOK_EXTENSIONS = {".epub", ".azw3", ".mobi", ".pdf"}
 
+# ZIP 解压时的读写块大小
+EXTRACT_CHUNK_SIZE = 1024 * 1024  # 1MB
+
 # ZIP 内需要丢弃的文件
 JUNK_EXTENSIONS = {".url", ".txt"}
 
+# ZIP 通用标志位 bit 11：文件名以 UTF-8 编码存储
+_ZIP_UTF8_FLAG = 0x800
+
 
 def _decode_zip_filename(raw: str) -> str:
     """修复 ZIP 内 GBK 编码的文件名
@@ -135,18 +167,31 @@ def _decode_zip_filename(raw: str) -> str:
     Windows 中文环境打包的 ZIP 文件名以 GBK 编码存储，
     Python zipfile 默认按 CP437 解码，导致乱码。
     """
+    # 纯 ASCII 文件名在 CP437 与 GBK 下编码相同，无需转换
+    if raw.isascii():
+        return raw
     try:
         return raw.encode("cp437").decode("gbk")
     except (UnicodeDecodeError, UnicodeEncodeError):
         return raw
 
 
+def _entry_extension(name: str) -> str:
+    """ZIP 条目的小写扩展名（含点），语义同 os.path.splitext，但只做字符串切分"""
+    basename = name.rpartition("/")[2]
+    stem, dot, ext = basename.rpartition(".")
+    # 与 splitext 一致：以点开头的文件名（如 .epub）视为没有扩展名
+    if not dot or not stem.lstrip("."):
+        return ""
+    return "." + ext.lower()
+
+
 def extract_ebook(
     zip_path: Path,
     book_title: str,
     formats: list[str],
     keep_zip: bool = False,
-) -> list[Path]:
+) -> list[tuple[Path, int]]:
     """从 ZIP 中提取电子书文件
 
     Args:
@@ -156,7 +201,7 @@ def extract_ebook(
         keep_zip: 解压后是否保留 ZIP 文件
 
     Returns:
-        提取出的文件路径列表
+        提取出的 (文件路径, 文件大小) 列表
     """
     if not zip_path.exists() or not zipfile.is_zipfile(zip_path):
         logger.warning("非有效 ZIP 文件，跳过解压: %s", zip_path.name)
@@ -164,15 +209,19 @@ def extract_ebook(
 
     target_exts = {"." + fmt.lower().lstrip(".") for fmt in formats}
     dest_dir = zip_path.parent
-    extracted: list[Path] = []
+    extracted: list[tuple[Path, int]] = []
 
     with zipfile.ZipFile(zip_path, "r") as zf:
         for info in zf.infolist():
             if info.is_dir():
                 continue
 
-            decoded_name = _decode_zip_filename(info.filename)
-            ext = os.path.splitext(decoded_name)[1].lower()
+            # 设置了 UTF-8 标志位的条目 zipfile 已正确解码，无需再转 GBK
+            if info.flag_bits & _ZIP_UTF8_FLAG:
+                decoded_name = info.filename
+            else:
+                decoded_name = _decode_zip_filename(info.filename)
+            ext = _entry_extension(decoded_name)
 
             # 只提取目标格式的电子书
             if ext not in target_exts:
@@ -184,22 +233,31 @@ def extract_ebook(
             final_path = dest_dir / final_name
 
             # 避免重复解压
-            if final_path.exists():
+            try:
+                existing_size = final_path.stat().st_size
+            except FileNotFoundError:
+                pass
+            else:
                 logger.debug("文件已存在，跳过: %s", final_name)
-                extracted.append(final_path)
+                extracted.append((final_path, existing_size))
                 continue
 
-            # 提取到临时名然后重命名
-            data = zf.read(info.filename)
-            final_path.write_bytes(data)
-            extracted.append(final_path)
+            # 流式提取到临时名然后重命名（不把整个文件读入内存）。
+            # ZipExtFile 没有原生 readinto（基类实现仍是 read 后再拷贝），
+            # 复用缓冲区只会多一次拷贝，因此直接按大块 read/write
+            tmp_path = final_path.with_name(final_name + ".part")
+            with zf.open(info) as src, open(tmp_path, "wb") as dst:
+                shutil.copyfileobj(src, dst, EXTRACT_CHUNK_SIZE)
+            tmp_path.replace(final_path)
+            # ZipExtFile 读完时已校验 CRC 与解压后大小，file_size 即写入字节数
+            extracted.append((final_path, info.file_size))
             logger.debug("解压: %s → %s", decoded_name, final_name)
 
     if extracted:
         logger.info(
             "解压完成: %s → %s",
             zip_path.name,
-            ", ".join(p.name for p in extracted),
+            ", ".join(p.name for p, _ in extracted),
         )
         if not keep_zip:
             zip_path.unlink()
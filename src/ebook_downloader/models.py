@@ -5,6 +5,8 @@ from __future__ import annotations
 import enum
 from dataclasses import dataclass, field
 
+from .utils import sanitize_filename
+
 
 class DownloadStatus(enum.Enum):
     """下载状态"""
@@ -15,7 +17,7 @@ class DownloadStatus(enum.Enum):
     SKIPPED = "skipped"
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Book:
     """电子书元数据"""
     title: str
@@ -25,12 +27,26 @@ class Book:
     language: str = "ZH"
     level: str = "Unknown"
     formats: tuple[str, ...] = ()
+    # 小写标题/作者，构造时计算一次，供关键词筛选使用
+    title_lower: str = field(init=False, repr=False, compare=False)
+    author_lower: str = field(init=False, repr=False, compare=False)
+    # 清理后可用作文件名/目录名的标题与分类，构造时计算一次，供下载路径使用
+    clean_title: str = field(init=False, repr=False, compare=False)
+    clean_category: str = field(init=False, repr=False, compare=False)
+    _uid: str = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        object.__setattr__(self, "title_lower", self.title.lower())
+        object.__setattr__(self, "author_lower", self.author.lower())
+        object.__setattr__(self, "clean_title", sanitize_filename(self.title))
+        object.__setattr__(self, "clean_category", sanitize_filename(self.category))
+        # link 形如 https://url89.ctfile.com/f/xxx?p=8866
+        object.__setattr__(self, "_uid", self.link.split("/")[-1].split("?")[0])
 
     @property
     def uid(self) -> str:
-        """唯一标识：基于链接的最后路径段"""
-        # link 形如 https://url89.ctfile.com/f/xxx?p=8866
-        return self.link.split("/")[-1].split("?")[0]
+        """唯一标识：基于链接的最后路径段（构造时计算）"""
+        return self._uid
 
     @classmethod
     def from_dict(cls, data: dict) -> Book:
@@ -45,7 +61,7 @@ class Book:
         )
 
 
-@dataclass
+@dataclass(slots=True)
 class DownloadRecord:
     """下载记录（对应 SQLite 行）"""
     book_uid: str
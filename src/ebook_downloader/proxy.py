@@ -7,13 +7,17 @@
 from __future__ import annotations
 
 import asyncio
-import json
+import base64
 import logging
+import re
 import time
-from collections import deque
+from collections import OrderedDict, deque
+from operator import itemgetter
 from pathlib import Path
+from urllib.parse import SplitResult, unquote, urlsplit
 
 import httpx
+import orjson
 
 logger = logging.getLogger(__name__)
 
@@ -24,6 +28,17 @@ _MIN_FETCH_INTERVAL = 5.0
 _VERIFY_CONCURRENCY = 50     # 并发验证数
 _VERIFY_TIMEOUT = 5.0        # 单个代理验证超时（秒）
 _VERIFY_TARGET = "https://url89.ctfile.com"  # 验证目标（实际业务站点）
+_VERIFY_TUNNEL = "url89.ctfile.com:443"       # CONNECT 隧道目标（同上）
+
+# 纯文本代理列表中的一行：首尾空白之外为不含空白的 ip:port，忽略空行和 # 注释行
+_PROXY_LINE_RE = re.compile(r"^[^\S\n]*([^#\s]\S*:\S*)[^\S\n]*$", re.MULTILINE)
+
+# 已包含协议头的代理地址
+_PROXY_SCHEME_RE = re.compile(r"(?:https?|socks[45])://")
+
+# 近期失效代理的冷却参数（文件模式清空黑名单后仍跳过刚失效的代理）
+_RECENT_BAD_TTL = 300.0      # 冷却时间（秒）
+_RECENT_BAD_MAX = 1024       # 最多记录条数（LRU 淘汰）
 
 
 class ProxyPool:
@@ -36,9 +51,10 @@ class ProxyPool:
     设计要点：
     - 并发验证后按响应时间排序入队
     - get_proxy() 返回当前代理；invalidate() 淘汰当前代理并从队列取下一个
-    - 黑名单防止重复使用已失效代理
+    - 黑名单防止重复使用已失效代理；近期失效记录（带 TTL）在黑名单清空后继续生效
     - asyncio.Lock 防止并发拉取（thundering herd）
-    - 不可用时 graceful fallback 为直连（返回 None）
+    - 文件模式下代理都在冷却期时等待最早的冷却结束，不回退直连
+    - 数据源彻底不可用时 graceful fallback 为直连（返回 None）
     """
 
     def __init__(
@@ -51,10 +67,18 @@ class ProxyPool:
         self._current_proxy: str | None = None
         self._queue: deque[str] = deque()        # 待使用的代理队列（已验证、按速度排序）
         self._blacklist: set[str] = set()         # 本次运行中已失效的代理
+        self._recent_bad: OrderedDict[str, float] = OrderedDict()  # 代理 → 失效时间
         self._lock = asyncio.Lock()
         self._last_fetch_time: float = 0.0
         self._file_round: int = 0             # 文件模式：当前第几轮
         self._file_exhausted: bool = False     # 文件模式：验证后 0 可用，彻底放弃
+        self._api_client: httpx.AsyncClient | None = None  # API 模式：复用的 HTTP 客户端
+
+    async def aclose(self) -> None:
+        """关闭 API 拉取使用的 HTTP 客户端"""
+        if self._api_client:
+            await self._api_client.aclose()
+            self._api_client = None
 
     async def get_proxy(self) -> str | None:
         """获取当前可用代理，无可用时自动轮换或拉取"""
@@ -74,6 +98,7 @@ class ProxyPool:
             self._current_proxy = None
             if old:
                 self._blacklist.add(old)
+                self._mark_recent_bad(old)
                 logger.info(
                     "代理已加入黑名单 (黑名单: %d, 队列剩余: %d): %s",
                     len(self._blacklist), len(self._queue), old,
@@ -106,6 +131,34 @@ class ProxyPool:
         elif self._api_url:
             await self._fetch_from_api()
 
+    def _mark_recent_bad(self, proxy: str) -> None:
+        """记录代理失效时间，超出容量时淘汰最早的记录"""
+        self._recent_bad[proxy] = time.monotonic()
+        self._recent_bad.move_to_end(proxy)
+        while len(self._recent_bad) > _RECENT_BAD_MAX:
+            self._recent_bad.popitem(last=False)
+
+    def _is_recent_bad(self, proxy: str) -> bool:
+        """代理是否在冷却期内（过期记录顺便清除）"""
+        failed_at = self._recent_bad.get(proxy)
+        if failed_at is None:
+            return False
+        if time.monotonic() - failed_at < _RECENT_BAD_TTL:
+            return True
+        del self._recent_bad[proxy]
+        return False
+
+    def _cooldown_remaining(self, proxies: list[str]) -> float | None:
+        """proxies 中最早结束冷却的剩余时间（秒）；都不在冷却期时返回 None"""
+        now = time.monotonic()
+        remaining = [
+            _RECENT_BAD_TTL - (now - failed_at)
+            for p in proxies
+            if (failed_at := self._recent_bad.get(p)) is not None
+        ]
+        positive = [r for r in remaining if r > 0]
+        return min(positive) if positive else None
+
     def _dequeue_valid(self) -> str | None:
         """从队列头部取出第一个不在黑名单中的代理"""
         while self._queue:
@@ -138,27 +191,36 @@ class ProxyPool:
             self._file_exhausted = True
             return
 
-        self._file_round += 1
-
-        if self._file_round > 1:
-            # 非首轮：清空黑名单，给所有代理重新验证的机会
+        next_round = self._file_round + 1
+        # 非首轮：不再按黑名单排除，给所有代理重新验证的机会（近期失效的仍在冷却中）
+        excluded = self._blacklist if next_round == 1 else frozenset()
+        proxies = [p for p in proxies if p not in excluded]
+
+        # 可用代理都在冷却期：等到最早的一个冷却结束，而不是回退为直连
+        candidates = [p for p in proxies if not self._is_recent_bad(p)]
+        while not candidates:
+            wait = self._cooldown_remaining(proxies)
+            if wait is None:
+                self._file_exhausted = True
+                return
+            logger.info("文件代理均在冷却期，等待 %.1f 秒后重试", wait)
+            await asyncio.sleep(wait)
+            candidates = [p for p in proxies if not self._is_recent_bad(p)]
+
+        # 确定要进行新一轮验证后才推进轮次
+        self._file_round = next_round
+        if next_round > 1:
             old_blacklist_size = len(self._blacklist)
             self._blacklist.clear()
             logger.info(
                 "文件代理第 %d 轮复用: 清空黑名单 (%d 个), 重新验证全部 %d 个代理",
-                self._file_round, old_blacklist_size, len(proxies),
+                next_round, old_blacklist_size, len(proxies),
             )
-
-        candidates = [p for p in proxies if p not in self._blacklist]
         logger.info(
             "文件代理加载 (第 %d 轮): 共 %d 个, 待验证 %d 个",
             self._file_round, len(proxies), len(candidates),
         )
 
-        if not candidates:
-            self._file_exhausted = True
-            return
-
         # 并发验证
         verified = await _verify_proxies(candidates)
 
@@ -181,25 +243,27 @@ class ProxyPool:
 
         self._last_fetch_time = time.monotonic()
 
-        try:
+        if self._api_client is None:
             # proxy=None: 绕过系统代理（macOS Surge/Clash），直连代理池 API
-            async with httpx.AsyncClient(
+            self._api_client = httpx.AsyncClient(
                 timeout=httpx.Timeout(15),
                 proxy=None,
-            ) as client:
-                resp = await client.get(self._api_url)
+            )
 
-                if resp.status_code != 200:
-                    logger.warning("代理 API 返回 HTTP %d", resp.status_code)
-                    return
+        try:
+            resp = await self._api_client.get(self._api_url)
 
-                proxies = _parse_proxy_response(resp.text)
-                # 过滤黑名单
-                candidates = [p for p in proxies if p not in self._blacklist]
-                logger.info(
-                    "拉取代理: 共 %d 个, 去除黑名单后 %d 个待验证",
-                    len(proxies), len(candidates),
-                )
+            if resp.status_code != 200:
+                logger.warning("代理 API 返回 HTTP %d", resp.status_code)
+                return
+
+            proxies = _parse_proxy_response(resp.content)
+            # 过滤黑名单
+            candidates = [p for p in proxies if p not in self._blacklist]
+            logger.info(
+                "拉取代理: 共 %d 个, 去除黑名单后 %d 个待验证",
+                len(proxies), len(candidates),
+            )
 
         except Exception as e:
             logger.warning("代理 API 请求失败: %s", e)
@@ -230,7 +294,7 @@ async def _verify_proxies(proxies: list[str]) -> list[str]:
 
     # 过滤成功的，按响应时间排序
     valid: list[tuple[str, float]] = [r for r in results if r is not None]
-    valid.sort(key=lambda x: x[1])
+    valid.sort(key=itemgetter(1))
 
     if valid:
         logger.info(
@@ -245,11 +309,50 @@ async def _verify_proxies(proxies: list[str]) -> list[str]:
 async def _test_proxy(proxy_url: str) -> tuple[str, float] | None:
     """测试单个代理是否可用
 
-    通过代理向目标站点发送 HEAD 请求，验证 HTTPS 隧道（CONNECT）是否可用。
+    HTTP 代理直接建立 TCP 连接发送 CONNECT 请求，验证 HTTPS 隧道是否可用，
+    无需为每个候选代理构造 httpx 客户端；其他协议（socks 等）回退为 httpx HEAD 请求。
 
     Returns:
         (proxy_url, response_time) 或 None（不可用）
     """
+    parts = urlsplit(proxy_url)
+    if parts.scheme != "http" or not parts.hostname:
+        return await _test_proxy_via_httpx(proxy_url)
+
+    start = time.monotonic()
+    try:
+        ok = await asyncio.wait_for(_open_tunnel(parts), _VERIFY_TIMEOUT)
+    except Exception:
+        return None
+    return (proxy_url, time.monotonic() - start) if ok else None
+
+
+async def _open_tunnel(parts: SplitResult) -> bool:
+    """向 HTTP 代理发送 CONNECT 请求，状态码为 200 即隧道建立成功"""
+    reader, writer = await asyncio.open_connection(parts.hostname, parts.port or 80)
+    try:
+        request = f"CONNECT {_VERIFY_TUNNEL} HTTP/1.1\r\nHost: {_VERIFY_TUNNEL}\r\n"
+        if parts.username:
+            credentials = f"{unquote(parts.username)}:{unquote(parts.password or '')}"
+            token = base64.b64encode(credentials.encode("utf-8")).decode("ascii")
+            request += f"Proxy-Authorization: Basic {token}\r\n"
+        writer.write((request + "\r\n").encode("utf-8"))
+        await writer.drain()
+        status_line = await reader.readline()
+    finally:
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except Exception:
+            pass
+
+    # 形如 b"HTTP/1.1 200 Connection established\r\n"
+    fields = status_line.split(None, 2)
+    return len(fields) >= 2 and fields[1] == b"200"
+
+
+async def _test_proxy_via_httpx(proxy_url: str) -> tuple[str, float] | None:
+    """通过代理向目标站点发送 HEAD 请求（用于非 HTTP 协议的代理）"""
     start = time.monotonic()
     try:
         async with httpx.AsyncClient(
@@ -267,18 +370,17 @@ async def _test_proxy(proxy_url: str) -> tuple[str, float] | None:
 
 
 def _parse_proxy_list(text: str) -> list[str]:
-    """解析纯文本代理列表（每行一个 ip:port）"""
+    """解析纯文本代理列表（每行一个 ip:port），单次正则扫描提取全部行"""
     result = []
-    for line in text.splitlines():
-        line = line.strip()
-        if line and ":" in line and not line.startswith("#"):
-            p = _normalize_proxy(line)
-            if p:
-                result.append(p)
+    append = result.append
+    for raw in _PROXY_LINE_RE.findall(text):
+        p = _normalize_proxy(raw)
+        if p:
+            append(p)
     return result
 
 
-def _parse_proxy_response(text: str) -> list[str]:
+def _parse_proxy_response(body: bytes) -> list[str]:
     """解析代理 API 响应，兼容多种格式，统一返回代理列表
 
     支持格式：
@@ -286,13 +388,13 @@ def _parse_proxy_response(text: str) -> list[str]:
     2. JSON 单代理: {"proxy": "ip:port"} / {"ip": "x", "port": y}
     3. JSON 列表: ["ip:port", ...]
     """
-    text = text.strip()
-    if not text:
+    body = body.strip()
+    if not body:
         return []
 
-    # 尝试 JSON 解析
+    # 尝试 JSON 解析（orjson 直接解析字节）
     try:
-        data = json.loads(text)
+        data = orjson.loads(body)
 
         # JSON 列表
         if isinstance(data, list):
@@ -315,18 +417,11 @@ def _parse_proxy_response(text: str) -> list[str]:
             p = _normalize_proxy(data)
             return [p] if p else []
 
-    except (json.JSONDecodeError, ValueError):
+    except orjson.JSONDecodeError:
         pass
 
     # 纯文本格式：每行一个 ip:port（快代理格式）
-    result = []
-    for line in text.splitlines():
-        line = line.strip()
-        if line and ":" in line:
-            p = _normalize_proxy(line)
-            if p:
-                result.append(p)
-    return result
+    return _parse_proxy_list(body.decode("utf-8", errors="replace"))
 
 
 def _extract_proxy_from_dict(data: dict) -> str | None:
@@ -348,7 +443,7 @@ def _normalize_proxy(raw: str) -> str | None:
         return None
 
     # 已包含协议头
-    if raw.startswith(("http://", "https://", "socks5://", "socks4://")):
+    if _PROXY_SCHEME_RE.match(raw):
         return raw
 
     # 纯 ip:port → 默认 http 协议
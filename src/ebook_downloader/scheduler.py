@@ -2,24 +2,36 @@
 
 架构：
   生产者 (CDN Fetcher)      asyncio.Queue       消费者 (Downloader)
-  browser_semaphore + delay ──put──> CDNTask ──get──> 纯HTTP下载+ZIP解压
+  N workers + delay    ──put──> CDNTask ──get──> 纯HTTP下载+ZIP解压
 """
 
 from __future__ import annotations
 
 import asyncio
 import logging
+import os
 import random
-import re
 import time
 import zipfile
 import zlib
 from dataclasses import dataclass
 from pathlib import Path
 
-from .browser import BrowserManager, CDNResult, _is_proxy_error
+from .browser import (
+    BrowserManager,
+    CDNResult,
+    InvalidLinkError,
+    _check_book_link,
+    _is_proxy_error,
+)
 from .config import Config
-from .downloader import FileTooLargeError, download_file, extract_ebook
+from .downloader import (
+    CDNExpiredError,
+    FileTooLargeError,
+    create_download_client,
+    download_file,
+    extract_ebook,
+)
 from .models import Book, DownloadRecord, DownloadStatus
 from .state import StateDB
 from .utils import DownloadProgressManager
@@ -29,7 +41,9 @@ logger = logging.getLogger(__name__)
 
 def _is_permanent_error(exc: Exception) -> bool:
     """判断是否为不可恢复的错误（重试无意义）"""
-    if isinstance(exc, (zlib.error, zipfile.BadZipFile, FileTooLargeError)):
+    if isinstance(
+        exc, (zlib.error, zipfile.BadZipFile, FileTooLargeError, InvalidLinkError),
+    ):
         return True
     msg = str(exc)
     # ZIP 文件损坏
@@ -43,6 +57,9 @@ def _is_permanent_error(exc: Exception) -> bool:
 
 def _is_cdn_expired(exc: Exception) -> bool:
     """判断是否为 CDN 链接过期错误（403/404/410）"""
+    if isinstance(exc, CDNExpiredError):
+        return True
+    # 兜底：其他来源的异常按错误信息中的状态码判断
     msg = str(exc).lower()
     for code in ("403", "404", "410"):
         if code in msg:
@@ -50,14 +67,37 @@ def _is_cdn_expired(exc: Exception) -> bool:
     return False
 
 
-def sanitize_filename(name: str) -> str:
-    """清理文件名，移除非法字符"""
-    # 替换 Windows/Unix 非法字符
-    name = re.sub(r'[<>:"/\\|?*\x00-\x1f]', '_', name)
-    # 截断过长文件名（保留扩展名）
-    if len(name.encode("utf-8")) > 200:
-        name = name[:60]
-    return name.strip(". ")
+def _jittered(backoff: float) -> float:
+    """退避时间加 ±50% 随机抖动，打散同时失败的任务的重试时刻"""
+    return backoff * random.uniform(0.5, 1.5)
+
+
+def _remove_part_files(root: Path) -> tuple[int, int]:
+    """递归删除 root 下的 .part 文件，返回 (删除数量, 释放字节数)
+
+    os.scandir 遍历目录时已带回文件类型，每个文件只需一次 stat + 一次 unlink。
+    """
+    count = 0
+    total_size = 0
+    stack = [str(root)]
+    while stack:
+        try:
+            it = os.scandir(stack.pop())
+        except OSError:
+            continue
+        with it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.name.endswith(".part"):
+                    try:
+                        size = entry.stat(follow_symlinks=False).st_size
+                        os.unlink(entry.path)
+                    except OSError:
+                        continue
+                    count += 1
+                    total_size += size
+    return count, total_size
 
 
 @dataclass
@@ -72,7 +112,7 @@ class CDNTask:
 class Scheduler:
     """下载调度器：生产者-消费者架构
 
-    生产者：浏览器获取 CDN 链接（受 browser._semaphore + smart_delay 限流）
+    生产者：浏览器获取 CDN 链接（browser_concurrency 个 worker + smart_delay 限流）
     消费者：纯 HTTP 下载 + ZIP 解压（受 download_concurrency 控制并发数）
     """
 
@@ -87,9 +127,25 @@ class Scheduler:
         self.state = state
         self.browser = browser
         self.progress = progress
-        # 用于智能延迟：记录上次浏览器访问时间
+        # 用于智能延迟：最近一次已预约的浏览器访问时刻（monotonic）
         self._last_browser_access: float = 0.0
-        self._access_lock = asyncio.Lock()  # 保护 _last_browser_access
+        # CDN 获取阶段各次重试的指数退避基数（秒）：retry_backoff * 2^(attempt-1)，不超过上限
+        self._backoffs = [
+            min(config.retry_backoff_cap, config.retry_backoff * (1 << i))
+            for i in range(config.max_retries)
+        ]
+        # 所有消费者共享的 HTTP 客户端（复用 CDN 的 TCP/TLS 连接）
+        self._http = create_download_client(config)
+
+    async def aclose(self) -> None:
+        """关闭共享的 HTTP 客户端"""
+        await self._http.aclose()
+
+    async def __aenter__(self) -> Scheduler:
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        await self.aclose()
 
     async def run(self, books: list[Book]) -> dict[str, int]:
         """调度下载任务
@@ -101,16 +157,19 @@ class Scheduler:
         await self._cleanup_stale()
 
         # 过滤已完成和已跳过（文件损坏）的书籍
-        skip_uids = await self.state.get_skip_uids()
-        pending = [b for b in books if b.uid not in skip_uids]
+        completed_uids, skipped_uids = await self.state.get_terminal_uids()
+        pending = [
+            b for b in books
+            if b.uid not in completed_uids and b.uid not in skipped_uids
+        ]
 
         if not pending:
             logger.info("所有书籍已下载完成或已跳过，无需操作")
             return {"skipped": len(books)}
 
         # 统计已完成和已跳过的分别数量
-        completed_count = len(await self.state.get_completed_uids())
-        skipped_count = len(skip_uids) - completed_count
+        completed_count = len(completed_uids)
+        skipped_count = len(skipped_uids)
 
         logger.info(
             "待下载: %d / %d (已完成 %d, 已跳过 %d)",
@@ -134,31 +193,24 @@ class Scheduler:
             maxsize=self.config.cdn_queue_size,
         )
 
-        # 启动生产者（1个协程，内部并发受 browser._semaphore + smart_delay 控制）
-        producer = asyncio.create_task(
-            self._cdn_producer(pending, queue, stats),
-            name="cdn-producer",
-        )
-
-        # 启动 N 个消费者
         num_consumers = self.config.download_concurrency
-        consumers = [
-            asyncio.create_task(
-                self._download_consumer(i, queue, stats),
-                name=f"download-consumer-{i}",
-            )
-            for i in range(num_consumers)
-        ]
-
-        # 等待生产者完成
-        await producer
-
-        # 生产者完成后发送 N 个 sentinel 通知消费者退出
-        for _ in range(num_consumers):
-            await queue.put(None)
 
-        # 等待所有消费者处理完毕
-        await asyncio.gather(*consumers)
+        async def produce() -> None:
+            await self._cdn_producer(pending, queue, stats)
+            # 生产者完成后发送 N 个 sentinel 通知消费者退出
+            for _ in range(num_consumers):
+                await queue.put(None)
+
+        # 生产者（1个协程，内部由 browser_concurrency 个 worker + smart_delay 控制）
+        # 与 N 个消费者放在同一 TaskGroup：任一方出现未捕获异常时其余任务一并取消，
+        # 不会留下永远等待队列的消费者
+        async with asyncio.TaskGroup() as tg:
+            tg.create_task(produce(), name="cdn-producer")
+            for i in range(num_consumers):
+                tg.create_task(
+                    self._download_consumer(i, queue, stats),
+                    name=f"download-consumer-{i}",
+                )
 
         return stats
 
@@ -171,18 +223,28 @@ class Scheduler:
         """生产者：并发获取 CDN 链接，成功后放入队列
 
         内部并发控制：
-        - cdn_semaphore 限制排队等待的协程数量，避免过多协程堆积
-        - browser._semaphore 控制实际浏览器并发（在 browser.fetch_cdn_url 内部）
+        - 固定 browser_concurrency 个 worker 从书籍队列取任务，每个 worker
+          同一时间只占用一个浏览器 Context（browser.fetch_cdn_url 内部的 Context 池）
         - smart_delay 控制访问间隔（反爬策略不变）
         """
-        cdn_semaphore = asyncio.Semaphore(self.config.browser_concurrency * 2)
-
-        async def fetch_one(book: Book) -> None:
-            async with cdn_semaphore:
-                await self._fetch_cdn_and_enqueue(book, queue, stats)
+        book_queue: asyncio.Queue[Book] = asyncio.Queue()
+        for book in books:
+            book_queue.put_nowait(book)
+
+        async def worker() -> None:
+            while True:
+                try:
+                    book = book_queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                try:
+                    await self._fetch_cdn_and_enqueue(book, queue, stats)
+                except Exception as e:
+                    logger.error("CDN 获取异常: %s — %s", book.title, e)
 
-        tasks = [fetch_one(book) for book in books]
-        await asyncio.gather(*tasks, return_exceptions=True)
+        async with asyncio.TaskGroup() as tg:
+            for i in range(self.config.browser_concurrency):
+                tg.create_task(worker(), name=f"cdn-worker-{i}")
 
     async def _fetch_cdn_and_enqueue(
         self,
@@ -203,24 +265,29 @@ class Scheduler:
 
         for attempt in range(1, self.config.max_retries + 1):
             try:
+                # 非法链接是永久错误：不占用智能延迟配额，也不进入浏览器
+                _check_book_link(book)
+
                 # 智能延迟：模拟真人行为
                 await self._smart_delay()
 
-                # 更新状态为 DOWNLOADING
+                # 更新状态为 DOWNLOADING。首次尝试不落库：记录不存在即视为待下载，
+                # 最终状态（完成/失败/跳过）才是必需的写入；重试时落库以记录重试次数
                 record.status = DownloadStatus.DOWNLOADING
                 record.retry_count = attempt - 1
-                await self.state.upsert(record)
+                if attempt > 1:
+                    await self.state.upsert(record)
 
-                # 获取 CDN 链接（受 browser._semaphore 限制）
+                # 获取 CDN 链接（受浏览器 Context 池限制）
                 cdn_result = await self.browser.fetch_cdn_url(book)
                 record.cdn_url = cdn_result.url
 
                 # 计算目标路径
-                filename = cdn_result.filename or sanitize_filename(book.title)
+                filename = cdn_result.filename or book.clean_title
                 if not Path(filename).suffix:
                     filename += ".epub"
 
-                category_dir = sanitize_filename(book.category) or "未分类"
+                category_dir = book.clean_category or "未分类"
                 dest = self.config.download_path / category_dir / filename
 
                 # 构造 CDNTask 入队
@@ -230,7 +297,11 @@ class Scheduler:
                     cdn_result=cdn_result,
                     dest=dest,
                 )
-                await queue.put(task)
+                # 队列有空位时直接入队，只在队列满时才挂起等待
+                try:
+                    queue.put_nowait(task)
+                except asyncio.QueueFull:
+                    await queue.put(task)
                 logger.debug("CDN 链接已入队: %s → %s", book.title, cdn_result.url[:80])
                 return
 
@@ -254,8 +325,9 @@ class Scheduler:
                         logger.info("代理异常，已触发切换: %s", book.title)
 
                 if attempt < self.config.max_retries:
-                    backoff = self.config.retry_backoff * (2 ** (attempt - 1))
-                    logger.debug("等待 %d 秒后重试...", backoff)
+                    # 指数退避 + 随机抖动，避免多个 worker 同时重试
+                    backoff = _jittered(self._backoffs[attempt - 1])
+                    logger.debug("等待 %.1f 秒后重试...", backoff)
                     await asyncio.sleep(backoff)
 
         # 所有重试均失败
@@ -282,7 +354,10 @@ class Scheduler:
     ) -> None:
         """消费者：从队列获取任务，执行 HTTP 下载 + ZIP 解压"""
         while True:
-            task = await queue.get()
+            try:
+                task = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                task = await queue.get()
             if task is None:
                 queue.task_done()
                 break
@@ -311,40 +386,35 @@ class Scheduler:
         book = task.book
         record = task.record
         task_id: int | None = None
-
         for attempt in range(1, self.config.max_download_retries + 1):
             try:
                 # 创建进度条任务
                 task_id = self.progress.add_task(book.title)
 
                 def on_progress(downloaded: int, total: int, chunk: int) -> None:
+                    # 刷新频率由 DownloadProgressManager 内部节流
                     self.progress.update_task(task_id, downloaded, total)
 
                 # HTTP 下载
-                result_path = await download_file(
-                    task.cdn_result.url, task.dest, self.config,
+                result_path, result_size = await download_file(
+                    self._http, task.cdn_result.url, task.dest, self.config,
                     progress_cb=on_progress,
                 )
 
-                # 解压 ZIP → 电子书文件
-                clean_title = sanitize_filename(book.title)
-                ebook_files = extract_ebook(
+                # 解压 ZIP → 电子书文件（解压是阻塞的 CPU/磁盘操作，放到线程池）
+                ebook_files = await asyncio.to_thread(
+                    extract_ebook,
                     result_path,
-                    book_title=clean_title,
+                    book_title=book.clean_title,
                     formats=self.config.extract_formats,
                     keep_zip=self.config.keep_zip,
                 )
 
                 # 更新记录
                 record.status = DownloadStatus.COMPLETED
-                if ebook_files:
-                    record.file_path = str(ebook_files[0])
-                    record.file_size = sum(f.stat().st_size for f in ebook_files)
-                else:
-                    record.file_path = str(result_path)
-                    record.file_size = (
-                        result_path.stat().st_size if result_path.exists() else 0
-                    )
+                saved_files = ebook_files or [(result_path, result_size)]
+                record.file_path = str(saved_files[0][0])
+                record.file_size = sum(size for _, size in saved_files)
                 record.error_msg = ""
                 await self.state.upsert(record)
 
@@ -384,8 +454,9 @@ class Scheduler:
 
                 # 临时错误 → 短暂退避后重试
                 if attempt < self.config.max_download_retries:
-                    backoff = 3 * attempt  # 3s, 6s
-                    logger.debug("下载重试等待 %d 秒...", backoff)
+                    # 3s, 6s ...（不超过上限），同样加随机抖动
+                    backoff = _jittered(min(self.config.retry_backoff_cap, 3 * attempt))
+                    logger.debug("下载重试等待 %.1f 秒...", backoff)
                     await asyncio.sleep(backoff)
 
         # 所有下载重试均失败
@@ -405,15 +476,14 @@ class Scheduler:
         - .part 文件无法续传（CDN 链接已过期），直接删除释放磁盘空间
         - downloading 状态重置为 pending，使其能被重新调度
         """
-        # 1. 清理 .part 文件
-        part_files = list(self.config.download_path.rglob("*.part"))
-        if part_files:
-            total_size = sum(f.stat().st_size for f in part_files if f.exists())
-            for f in part_files:
-                f.unlink(missing_ok=True)
+        # 1. 清理 .part 文件（目录遍历与删除都是阻塞系统调用，放到线程池）
+        count, total_size = await asyncio.to_thread(
+            _remove_part_files, self.config.download_path,
+        )
+        if count:
             logger.info(
                 "已清理 %d 个残留 .part 文件 (释放 %.1f MB)",
-                len(part_files), total_size / (1024 * 1024),
+                count, total_size / (1024 * 1024),
             )
 
         # 2. 将卡在 downloading 状态的记录重置为 pending
@@ -430,21 +500,24 @@ class Scheduler:
         if not self.config.enable_smart_delay:
             return
 
-        async with self._access_lock:
-            now = time.monotonic()
-            elapsed = now - self._last_browser_access
+        target_delay = random.uniform(
+            self.config.request_min_delay,
+            self.config.request_max_delay,
+        )
 
-            target_delay = random.uniform(
-                self.config.request_min_delay,
-                self.config.request_max_delay,
+        # 预约访问时刻：上次预约时刻 + 目标间隔，读取与写回之间没有 await，
+        # 在单线程事件循环中天然原子，无需加锁；各 worker 按预约时刻并行等待
+        now = time.monotonic()
+        if self._last_browser_access > 0:
+            slot = max(now, self._last_browser_access + target_delay)
+        else:
+            slot = now
+        self._last_browser_access = slot
+
+        wait_time = slot - now
+        if wait_time > 0:
+            logger.debug(
+                "智能延迟: 等待 %.1f 秒 (目标间隔=%.1f秒)",
+                wait_time, target_delay,
             )
-
-            if self._last_browser_access > 0 and elapsed < target_delay:
-                wait_time = target_delay - elapsed
-                logger.debug(
-                    "智能延迟: 等待 %.1f 秒 (目标间隔=%.1f秒, 已过=%.1f秒)",
-                    wait_time, target_delay, elapsed,
-                )
-                await asyncio.sleep(wait_time)
-
-            self._last_browser_access = time.monotonic()
+            await asyncio.sleep(wait_time)
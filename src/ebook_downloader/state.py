@@ -2,7 +2,10 @@
 
 from __future__ import annotations
 
+import asyncio
+import contextlib
 import logging
+import sqlite3
 from datetime import datetime, timezone
 from pathlib import Path
 
@@ -29,30 +32,115 @@ CREATE TABLE IF NOT EXISTS download_records (
     updated_at  TEXT NOT NULL
 );
 
-CREATE INDEX IF NOT EXISTS idx_status ON download_records(status);
+-- (status, book_uid) 覆盖索引：按状态取 uid 的查询只读索引，不回表
+DROP INDEX IF EXISTS idx_status;
+CREATE INDEX IF NOT EXISTS idx_status_uid ON download_records(status, book_uid);
 CREATE INDEX IF NOT EXISTS idx_category ON download_records(category);
 """
 
 
+# 连接级 PRAGMA：WAL 下读写互不阻塞，NORMAL 同步级别只在检查点时 fsync
+_PRAGMAS = """
+PRAGMA journal_mode = WAL;
+PRAGMA synchronous = NORMAL;
+PRAGMA temp_store = MEMORY;
+PRAGMA mmap_size = 268435456;
+"""
+
+# 写回队列：攒批的最长等待时间（秒）与触发立即写入的行数
+_WRITE_INTERVAL = 0.2
+_WRITE_BATCH_SIZE = 50
+
+
+# 读取整条记录时的列顺序，与 DownloadRecord 字段顺序一致（_row_to_record 按位置构造）
+_RECORD_COLUMNS = (
+    "book_uid, title, author, category, link, status, file_path, file_size, "
+    "cdn_url, error_msg, retry_count, created_at, updated_at"
+)
+
+
+_UPSERT_SQL = """
+INSERT INTO download_records
+    (book_uid, title, author, category, link, status,
+     file_path, file_size, cdn_url, error_msg, retry_count,
+     created_at, updated_at)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(book_uid) DO UPDATE SET
+    status = excluded.status,
+    file_path = excluded.file_path,
+    file_size = excluded.file_size,
+    cdn_url = excluded.cdn_url,
+    error_msg = excluded.error_msg,
+    retry_count = excluded.retry_count,
+    updated_at = excluded.updated_at
+"""
+
+
+def _record_to_row(record: DownloadRecord, now: str) -> tuple:
+    """DownloadRecord → _UPSERT_SQL 的参数元组"""
+    return (
+        record.book_uid, record.title, record.author,
+        record.category, record.link, record.status.value,
+        record.file_path, record.file_size, record.cdn_url,
+        record.error_msg, record.retry_count,
+        record.created_at or now, now,
+    )
+
+
 class StateDB:
-    """异步 SQLite 状态管理"""
+    """异步 SQLite 状态管理
+
+    upsert 采用写回（write-behind）：记录先按 book_uid 合并到内存中的待写表，
+    由后台任务每 _WRITE_INTERVAL 秒或攒满 _WRITE_BATCH_SIZE 行时批量写入并提交一次。
+    所有读取与批量更新语句执行前都会先 flush()，保证读到最新状态。
+    """
 
     def __init__(self, db_path: Path) -> None:
         self.db_path = db_path
         self._db: aiosqlite.Connection | None = None
+        # 待写入的行：book_uid → _UPSERT_SQL 参数元组（同一记录只保留最新版本）
+        self._pending: dict[str, tuple] = {}
+        self._wakeup = asyncio.Event()
+        # 关闭信号：通知后台写回任务退出（不用 cancel，避免中断进行中的事务）
+        self._stop = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._writer_task: asyncio.Task | None = None
+        # 已完成总字节数：open() 时按 SUM 初始化，此后由 upsert 增量维护；
+        # 只记录本次会话中 upsert 为已完成的记录大小（book_uid → 字节数），用于扣除旧值
+        self._completed_sizes: dict[str, int] = {}
+        self._completed_bytes = 0
 
     async def open(self) -> None:
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
-        self._db = await aiosqlite.connect(str(self.db_path))
+        # 手动事务模式：单条语句自动提交，批量写入显式 BEGIN IMMEDIATE ... COMMIT
+        self._db = await aiosqlite.connect(str(self.db_path), isolation_level=None)
         self._db.row_factory = aiosqlite.Row
+        await self._db.executescript(_PRAGMAS)
         await self._db.executescript(_SCHEMA)
-        await self._db.commit()
+        cursor = await self._db.execute(
+            "SELECT COALESCE(SUM(file_size), 0) FROM download_records WHERE status = ?",
+            (DownloadStatus.COMPLETED.value,),
+        )
+        (self._completed_bytes,) = await cursor.fetchone()
+        self._completed_sizes = {}
+        self._stop.clear()
+        self._writer_task = asyncio.create_task(self._write_behind())
         logger.debug("数据库已打开: %s", self.db_path)
 
     async def close(self) -> None:
+        if self._writer_task is not None:
+            # 通知写回任务退出并等待其结束（进行中的 flush 会完整执行完毕）；
+            # asyncio.wait 不会把写回任务自身的异常或取消抛给 close()
+            self._stop.set()
+            self._wakeup.set()
+            await asyncio.wait({self._writer_task})
+            self._writer_task = None
         if self._db:
-            await self._db.close()
-            self._db = None
+            try:
+                await self.flush()
+            finally:
+                await self._db.close()
+                self._db = None
 
     @property
     def db(self) -> aiosqlite.Connection:
@@ -61,38 +149,77 @@ class StateDB:
         return self._db
 
     async def upsert(self, record: DownloadRecord) -> None:
-        """插入或更新下载记录"""
+        """插入或更新下载记录（写回：加入待写表，由后台任务批量提交）"""
+        await self.upsert_many([record])
+
+    async def upsert_many(self, records: list[DownloadRecord]) -> None:
+        """批量插入或更新下载记录（写回：加入待写表，由后台任务批量提交）"""
+        if not records:
+            return
         now = datetime.now(timezone.utc).isoformat()
-        await self.db.execute(
-            """
-            INSERT INTO download_records
-                (book_uid, title, author, category, link, status,
-                 file_path, file_size, cdn_url, error_msg, retry_count,
-                 created_at, updated_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ON CONFLICT(book_uid) DO UPDATE SET
-                status = excluded.status,
-                file_path = excluded.file_path,
-                file_size = excluded.file_size,
-                cdn_url = excluded.cdn_url,
-                error_msg = excluded.error_msg,
-                retry_count = excluded.retry_count,
-                updated_at = excluded.updated_at
-            """,
-            (
-                record.book_uid, record.title, record.author,
-                record.category, record.link, record.status.value,
-                record.file_path, record.file_size, record.cdn_url,
-                record.error_msg, record.retry_count,
-                record.created_at or now, now,
-            ),
-        )
-        await self.db.commit()
+        completed = DownloadStatus.COMPLETED
+        for r in records:
+            self._pending[r.book_uid] = _record_to_row(r, now)
+            # 增量维护已完成总大小：先扣除本次会话中记下的旧值，仍为已完成时再计入新值。
+            # 库中已完成的记录在调度前即被过滤，不会再次 upsert，因此无需预先加载其大小
+            self._completed_bytes -= self._completed_sizes.pop(r.book_uid, 0)
+            if r.status is completed:
+                self._completed_sizes[r.book_uid] = r.file_size
+                self._completed_bytes += r.file_size
+        # 攒满一批时由调用方直接写入，形成背压；否则唤醒后台任务定时写入
+        if len(self._pending) >= _WRITE_BATCH_SIZE:
+            await self.flush()
+        else:
+            self._wakeup.set()
+
+    async def flush(self) -> None:
+        """将待写表中的所有记录写入数据库（单个事务，一次提交）"""
+        async with self._flush_lock:
+            if not self._pending:
+                return
+            rows = list(self._pending.values())
+            self._pending.clear()
+            try:
+                # 一开始就取得写锁，避免事务中途由读锁升级为写锁时与其他连接冲突
+                await self.db.execute("BEGIN IMMEDIATE")
+                await self.db.executemany(_UPSERT_SQL, rows)
+                await self.db.execute("COMMIT")
+            except BaseException:
+                # 写入失败或被取消：回滚可能残留的事务（包括 BEGIN 已执行但 await
+                # 被取消的情况）。Connection.rollback() 在连接线程中按顺序执行，
+                # 没有活动事务时为空操作；回滚本身的错误不能掩盖原始异常
+                with contextlib.suppress(sqlite3.Error):
+                    await self.db.rollback()
+                # 放回未被更新版本覆盖的行，下次 flush 重试（COMMIT 实际已完成时
+                # 重复写入同一行也是幂等的）
+                for row in rows:
+                    self._pending.setdefault(row[0], row)
+                raise
+
+    async def _write_behind(self) -> None:
+        """后台写回任务：被唤醒后等待一个攒批间隔再统一写入，收到关闭信号时退出
+
+        关闭时剩余的待写记录由 close() 做最后一次 flush。
+        """
+        while not self._stop.is_set():
+            await self._wakeup.wait()
+            # 攒批间隔；关闭信号可提前结束等待
+            with contextlib.suppress(TimeoutError):
+                await asyncio.wait_for(self._stop.wait(), _WRITE_INTERVAL)
+            if self._stop.is_set():
+                return
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.warning("写入下载记录失败，稍后重试: %s", e)
 
     async def get(self, book_uid: str) -> DownloadRecord | None:
         """查询单条记录"""
+        await self.flush()
         cursor = await self.db.execute(
-            "SELECT * FROM download_records WHERE book_uid = ?", (book_uid,)
+            f"SELECT {_RECORD_COLUMNS} FROM download_records WHERE book_uid = ?",
+            (book_uid,),
         )
         row = await cursor.fetchone()
         if row is None:
@@ -101,32 +228,59 @@ class StateDB:
 
     async def get_by_status(self, status: DownloadStatus) -> list[DownloadRecord]:
         """按状态查询记录"""
+        await self.flush()
         cursor = await self.db.execute(
-            "SELECT * FROM download_records WHERE status = ?", (status.value,)
+            f"SELECT {_RECORD_COLUMNS} FROM download_records WHERE status = ?",
+            (status.value,),
         )
         rows = await cursor.fetchall()
         return [self._row_to_record(r) for r in rows]
 
-    async def get_completed_uids(self) -> set[str]:
+    async def get_all_records_dict(self) -> dict[str, DownloadRecord]:
+        """一次查询加载全部记录：book_uid → DownloadRecord"""
+        await self.flush()
+        cursor = await self.db.execute(f"SELECT {_RECORD_COLUMNS} FROM download_records")
+        rows = await cursor.fetchall()
+        to_record = self._row_to_record
+        return {row[0]: to_record(row) for row in rows}
+
+    async def get_completed_uids(self) -> frozenset[str]:
         """获取所有已完成的 book_uid 集合，用于快速跳过"""
+        await self.flush()
         cursor = await self.db.execute(
             "SELECT book_uid FROM download_records WHERE status = ?",
             (DownloadStatus.COMPLETED.value,),
         )
         rows = await cursor.fetchall()
-        return {row["book_uid"] for row in rows}
+        return frozenset(row["book_uid"] for row in rows)
 
-    async def get_skip_uids(self) -> set[str]:
+    async def get_skip_uids(self) -> frozenset[str]:
         """获取应跳过的 book_uid（已完成 + 文件损坏已跳过）"""
+        await self.flush()
         cursor = await self.db.execute(
             "SELECT book_uid FROM download_records WHERE status IN (?, ?)",
             (DownloadStatus.COMPLETED.value, DownloadStatus.SKIPPED.value),
         )
         rows = await cursor.fetchall()
-        return {row["book_uid"] for row in rows}
+        return frozenset(row["book_uid"] for row in rows)
+
+    async def get_terminal_uids(self) -> tuple[frozenset[str], frozenset[str]]:
+        """一次查询获取终态 book_uid：(已完成集合, 已跳过集合)"""
+        await self.flush()
+        cursor = await self.db.execute(
+            "SELECT book_uid, status FROM download_records WHERE status IN (?, ?)",
+            (DownloadStatus.COMPLETED.value, DownloadStatus.SKIPPED.value),
+        )
+        completed_value = DownloadStatus.COMPLETED.value
+        completed: list[str] = []
+        skipped: list[str] = []
+        for uid, status in await cursor.fetchall():
+            (completed if status == completed_value else skipped).append(uid)
+        return frozenset(completed), frozenset(skipped)
 
     async def stats(self) -> dict[str, int]:
         """统计各状态数量"""
+        await self.flush()
         cursor = await self.db.execute(
             "SELECT status, COUNT(*) as cnt FROM download_records GROUP BY status"
         )
@@ -134,25 +288,20 @@ class StateDB:
         return {row["status"]: row["cnt"] for row in rows}
 
     async def total_size(self) -> int:
-        """已下载总大小（字节）"""
-        cursor = await self.db.execute(
-            "SELECT COALESCE(SUM(file_size), 0) as total FROM download_records WHERE status = ?",
-            (DownloadStatus.COMPLETED.value,),
-        )
-        row = await cursor.fetchone()
-        return row["total"] if row else 0
+        """已下载总大小（字节），由 upsert 增量维护，无需查询数据库"""
+        return self._completed_bytes
 
     async def get_failed(self) -> list[DownloadRecord]:
         """获取所有失败的记录"""
         return await self.get_by_status(DownloadStatus.FAILED)
 
     async def reset_failed(self) -> int:
-        """将所有失败和跳过记录重置为 pending，返回影响行数"""
+        """将所有失败和跳过记录重置为 pending，返回影响行数（单条语句，自动提交）"""
+        await self.flush()
         cursor = await self.db.execute(
             "UPDATE download_records SET status = ?, error_msg = '', retry_count = 0 WHERE status IN (?, ?)",
             (DownloadStatus.PENDING.value, DownloadStatus.FAILED.value, DownloadStatus.SKIPPED.value),
         )
-        await self.db.commit()
         return cursor.rowcount
 
     async def reset_downloading(self) -> int:
@@ -160,27 +309,14 @@ class StateDB:
 
         用于清理上次运行中断后残留的异常状态。
         """
+        await self.flush()
         cursor = await self.db.execute(
             "UPDATE download_records SET status = ?, error_msg = '', retry_count = 0 WHERE status = ?",
             (DownloadStatus.PENDING.value, DownloadStatus.DOWNLOADING.value),
         )
-        await self.db.commit()
         return cursor.rowcount
 
     @staticmethod
     def _row_to_record(row: aiosqlite.Row) -> DownloadRecord:
-        return DownloadRecord(
-            book_uid=row["book_uid"],
-            title=row["title"],
-            author=row["author"],
-            category=row["category"],
-            link=row["link"],
-            status=DownloadStatus(row["status"]),
-            file_path=row["file_path"],
-            file_size=row["file_size"],
-            cdn_url=row["cdn_url"],
-            error_msg=row["error_msg"],
-            retry_count=row["retry_count"],
-            created_at=row["created_at"],
-            updated_at=row["updated_at"],
-        )
+        """按 _RECORD_COLUMNS 的列顺序位置构造，避免 13 个关键字参数的开销"""
+        return DownloadRecord(*row[:5], DownloadStatus(row[5]), *row[6:])
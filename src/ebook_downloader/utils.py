@@ -2,8 +2,11 @@
 
 from __future__ import annotations
 
+import functools
 import logging
+import re
 import sys
+import time
 from pathlib import Path
 
 from rich.console import Console
@@ -23,6 +26,34 @@ from rich.table import Table
 
 console = Console()
 
+# 单文件进度条的最小刷新间隔（秒），与 refresh_per_second=10 对齐
+_PROGRESS_UPDATE_INTERVAL = 0.1
+
+
+# Windows/Unix 文件名非法字符
+_ILLEGAL_FILENAME_RE = re.compile(r'[<>:"/\\|?*\x00-\x1f]')
+
+# 文件名字节数上限（常见文件系统上限为 255 字节，为扩展名留出余量）
+_MAX_FILENAME_BYTES = 200
+
+
+@functools.lru_cache(maxsize=1024)
+def sanitize_filename(name: str) -> str:
+    """清理文件名，移除非法字符（纯函数，按输入缓存：分类名大量重复）"""
+    # 替换 Windows/Unix 非法字符
+    name = _ILLEGAL_FILENAME_RE.sub('_', name)
+    # 截断过长文件名：按 UTF-8 字节数截断，不切断多字节字符。
+    # UTF-8 每字符最多 4 字节，字符数不超过上限的 1/4 时无需编码检查；
+    # 纯 ASCII 时字节数即字符数，直接按字符切片
+    if len(name) * 4 > _MAX_FILENAME_BYTES:
+        if name.isascii():
+            name = name[:_MAX_FILENAME_BYTES]
+        else:
+            encoded = name.encode("utf-8")
+            if len(encoded) > _MAX_FILENAME_BYTES:
+                name = encoded[:_MAX_FILENAME_BYTES].decode("utf-8", errors="ignore")
+    return name.strip(". ")
+
 
 def setup_logging(log_dir: Path, verbose: bool = False) -> None:
     """配置日志：同时输出到控制台和文件"""
@@ -71,6 +102,7 @@ class DownloadProgressManager:
             TimeElapsedColumn(),
             TimeRemainingColumn(),
             console=console,
+            refresh_per_second=10,
         )
         # 单文件下载进度
         self._files = Progress(
@@ -80,8 +112,11 @@ class DownloadProgressManager:
             DownloadColumn(),
             TransferSpeedColumn(),
             console=console,
+            refresh_per_second=10,
         )
         self._overall_task_id = None
+        # 单文件进度节流：task_id → (上次刷新时刻, 上次刷新时的已下载字节数)
+        self._last_updates: dict[int, tuple[float, int]] = {}
 
     def set_total(self, total: int) -> None:
         """设置总任务数"""
@@ -95,11 +130,27 @@ class DownloadProgressManager:
         return self._files.add_task(description, total=None)
 
     def update_task(self, task_id: int, downloaded: int, total: int) -> None:
-        """更新单文件进度"""
+        """更新单文件进度
+
+        按块回调非常频繁，而 Rich 每秒只重绘 10 次：距上次刷新不足
+        _PROGRESS_UPDATE_INTERVAL 且增量不足总大小 1/50（总大小未知时只看时间）
+        时跳过，下载完成时总是刷新。
+        """
+        now = time.monotonic()
+        last = self._last_updates.get(task_id)
+        if (
+            last is not None
+            and downloaded != total
+            and now - last[0] < _PROGRESS_UPDATE_INTERVAL
+            and (total <= 0 or downloaded - last[1] < total // 50)
+        ):
+            return
+        self._last_updates[task_id] = (now, downloaded)
         self._files.update(task_id, completed=downloaded, total=total or None)
 
     def complete_task(self, task_id: int) -> None:
         """标记单文件下载完成"""
+        self._last_updates.pop(task_id, None)
         self._files.remove_task(task_id)
 
     def advance_overall(self, advance: int = 1) -> None:
@@ -0,0 +1,352 @@
+"""BrowserManager / Scheduler：非法链接的提前拒绝、失效 Context 的丢弃"""
+
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from ebook_downloader.browser import (
+    BrowserManager,
+    InvalidLinkError,
+    _ContextSlot,
+    _HEAVY_RESOURCE_URL_RE,
+)
+from ebook_downloader.config import Config
+from ebook_downloader.models import Book, DownloadStatus
+from ebook_downloader.scheduler import Scheduler
+
+
+class _FakeProxyPool:
+    def __init__(self) -> None:
+        self.calls = 0
+
+    async def get_proxy(self) -> str | None:
+        self.calls += 1
+        return None
+
+    async def invalidate(self) -> None:
+        self.calls += 1
+
+
+class _FakeState:
+    def __init__(self) -> None:
+        self.records = []
+
+    async def upsert(self, record) -> None:
+        self.records.append((record.status, record.error_msg))
+
+
+class _FakeProgress:
+    def advance_overall(self) -> None:
+        pass
+
+
+_INVALID_BOOK = Book(title="t", author="a", link="链接未找到", category="c")
+
+
+def test_fetch_cdn_url_rejects_invalid_link_before_slot_and_proxy():
+    pool = _FakeProxyPool()
+    browser = BrowserManager(Config(), proxy_pool=pool)
+
+    with pytest.raises(InvalidLinkError):
+        asyncio.run(browser.fetch_cdn_url(_INVALID_BOOK))
+
+    assert pool.calls == 0
+    assert browser._active == 0
+    assert browser._idle_slots == []
+
+
+def test_scheduler_skips_invalid_link_without_delay_or_browser(tmp_path):
+    pool = _FakeProxyPool()
+    browser = BrowserManager(Config(), proxy_pool=pool)
+    state = _FakeState()
+
+    async def main() -> None:
+        async with Scheduler(
+            Config(project_root=tmp_path), state, browser, _FakeProgress(),
+        ) as scheduler:
+            async def no_delay() -> None:
+                raise AssertionError("不应进入智能延迟")
+
+            scheduler._smart_delay = no_delay
+            stats = {"completed": 0, "failed": 0}
+            queue: asyncio.Queue = asyncio.Queue()
+            await scheduler._fetch_cdn_and_enqueue(_INVALID_BOOK, queue, stats)
+            assert queue.empty()
+            assert stats["failed"] == 1
+
+    asyncio.run(main())
+
+    assert [status for status, _ in state.records] == [DownloadStatus.SKIPPED]
+    assert pool.calls == 0
+    assert browser._active == 0
+    assert browser._idle_slots == []
+
+
+class _FakeContext:
+    def __init__(self, fail: str | None = None) -> None:
+        self.fail = fail
+        self.closed = False
+
+    async def clear_cookies(self) -> None:
+        if self.fail == "clear_cookies":
+            raise RuntimeError("Target closed")
+
+    async def new_page(self):
+        if self.fail == "new_page":
+            raise RuntimeError("Target closed")
+        raise AssertionError("测试中不应打开页面")
+
+    async def route(self, *args) -> None:
+        pass
+
+    async def close(self) -> None:
+        self.closed = True
+        raise RuntimeError("already closed")
+
+
+class _FakeBrowser:
+    def __init__(self) -> None:
+        self.created: list[_FakeContext] = []
+
+    async def new_context(self, **kwargs) -> _FakeContext:
+        context = _FakeContext()
+        self.created.append(context)
+        return context
+
+
+def test_dead_context_is_rebuilt_when_clear_cookies_fails():
+    browser = BrowserManager(Config())
+    browser._browser = _FakeBrowser()
+    dead = _FakeContext(fail="clear_cookies")
+    slot = _ContextSlot(context=dead, proxy_url=None)
+
+    context = asyncio.run(browser._ensure_context(slot, None))
+
+    assert dead.closed
+    assert context is browser._browser.created[0]
+    assert slot.context is context
+
+
+def test_dead_context_is_dropped_when_new_page_fails():
+    browser = BrowserManager(Config())
+    browser._browser = _FakeBrowser()
+    dead = _FakeContext(fail="new_page")
+    slot = _ContextSlot(context=dead, proxy_url=None)
+
+    with pytest.raises(RuntimeError, match="Target closed"):
+        asyncio.run(browser._extract_cdn_url(slot, _INVALID_BOOK))
+
+    assert dead.closed
+    assert slot.context is None
+    assert slot.proxy_url is None
+
+
+class _FakeResponse:
+    def __init__(self, url: str, body: bytes | Exception, page: _FakePage | None = None,
+                 then: _FakeResponse | None = None) -> None:
+        self.url = url
+        self.status = 200
+        self._body = body
+        self._page = page
+        self._then = then
+
+    async def body(self) -> bytes:
+        # 模拟读取响应体期间，下一个 API 响应到达
+        if self._then is not None:
+            self._page.emit(self._then)
+        await asyncio.sleep(0)
+        if isinstance(self._body, Exception):
+            raise self._body
+        return self._body
+
+
+class _FakePage:
+    def __init__(self) -> None:
+        self.handlers = []
+        self.on_click = None
+
+    def on(self, event: str, handler) -> None:
+        assert event == "response"
+        self.handlers.append(handler)
+
+    def remove_listener(self, event: str, handler) -> None:
+        self.handlers.remove(handler)
+
+    def emit(self, response: _FakeResponse) -> None:
+        for handler in list(self.handlers):
+            handler(response)
+
+    async def goto(self, *args, **kwargs) -> None:
+        pass
+
+    async def wait_for_selector(self, *args, **kwargs) -> None:
+        pass
+
+
+def test_cdn_response_arriving_while_reading_first_body_is_not_missed():
+    page = _FakePage()
+    down_url = _FakeResponse(
+        "https://x/get_down_url.php",
+        b'{"code": 200, "downurl": "https://cdn/f.zip", "file_name": "f.zip"}',
+    )
+    file_url = _FakeResponse(
+        "https://x/get_file_url.php", b'{"code": 503}', page=page, then=down_url,
+    )
+    browser = BrowserManager(Config(browser_timeout=2))
+
+    async def click(p) -> None:
+        p.emit(file_url)
+
+    browser._click_download_button = click
+    book = Book(title="t", author="a", link="https://x/f/1", category="c")
+
+    result = asyncio.run(browser._navigate_and_extract(page, book))
+
+    assert result.url == "https://cdn/f.zip"
+    assert page.handlers == []
+
+
+def test_cdn_response_with_unreadable_body_is_skipped():
+    page = _FakePage()
+    down_url = _FakeResponse(
+        "https://x/get_down_url.php",
+        b'{"code": 200, "downurl": "https://cdn/f.zip", "file_name": "f.zip"}',
+    )
+    file_url = _FakeResponse(
+        "https://x/get_file_url.php",
+        RuntimeError("Network.getResponseBody: No resource with given identifier found"),
+    )
+    browser = BrowserManager(Config(browser_timeout=2))
+
+    async def click(p) -> None:
+        p.emit(file_url)
+        p.emit(down_url)
+
+    browser._click_download_button = click
+    book = Book(title="t", author="a", link="https://x/f/1", category="c")
+
+    result = asyncio.run(browser._navigate_and_extract(page, book))
+
+    assert result.url == "https://cdn/f.zip"
+    assert page.handlers == []
+
+
+def test_stalled_body_read_is_bounded_by_deadline():
+    page = _FakePage()
+    browser = BrowserManager(Config(browser_timeout=1))
+
+    class _StalledResponse(_FakeResponse):
+        async def body(self) -> bytes:
+            await asyncio.sleep(10)
+            return b""
+
+    async def click(p) -> None:
+        p.emit(_StalledResponse("https://x/get_file_url.php", b""))
+
+    browser._click_download_button = click
+    book = Book(title="t", author="a", link="https://x/f/1", category="c")
+
+    async def main() -> float:
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        with pytest.raises(TimeoutError):
+            await browser._navigate_and_extract(page, book)
+        return loop.time() - start
+
+    assert asyncio.run(main()) < 1.5
+    assert page.handlers == []
+
+
+def test_cdn_wait_shares_one_deadline():
+    page = _FakePage()
+    browser = BrowserManager(Config(browser_timeout=1))
+
+    async def slow_click(p) -> None:
+        await asyncio.sleep(0.6)
+        p.emit(_FakeResponse("https://x/get_file_url.php", b'{"code": 503}'))
+
+    browser._click_download_button = slow_click
+    book = Book(title="t", author="a", link="https://x/f/1", category="c")
+
+    async def main() -> float:
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        with pytest.raises(TimeoutError):
+            await browser._navigate_and_extract(page, book)
+        return loop.time() - start
+
+    assert asyncio.run(main()) < 1.5
+    assert page.handlers == []
+
+
+class _FakeElement:
+    def __init__(self, visible: bool = True) -> None:
+        self.visible = visible
+        self.clicked = False
+
+    @property
+    def first(self) -> _FakeElement:
+        return self
+
+    async def is_visible(self) -> bool:
+        return self.visible
+
+    async def click(self, timeout: float | None = None) -> None:
+        self.clicked = True
+
+
+class _FakeHandle:
+    def __init__(self, element: _FakeElement | None) -> None:
+        self.element = element
+        self.disposed = False
+
+    def as_element(self) -> _FakeElement | None:
+        return self.element
+
+    async def dispose(self) -> None:
+        self.disposed = True
+
+
+class _ButtonPage:
+    def __init__(self, handle: _FakeHandle, locator: _FakeElement) -> None:
+        self.handle = handle
+        self.locator_element = locator
+        self.selectors: list[str] = []
+
+    async def evaluate_handle(self, script: str) -> _FakeHandle:
+        return self.handle
+
+    def locator(self, selector: str) -> _FakeElement:
+        self.selectors.append(selector)
+        return self.locator_element
+
+
+@pytest.mark.parametrize("found", [True, False])
+def test_click_download_button_disposes_handle_and_falls_back(found):
+    element = _FakeElement()
+    locator = _FakeElement()
+    handle = _FakeHandle(element if found else None)
+    page = _ButtonPage(handle, locator)
+
+    asyncio.run(BrowserManager(Config())._click_download_button(page))
+
+    assert handle.disposed
+    assert element.clicked is found
+    assert locator.clicked is not found
+    assert bool(page.selectors) is not found
+
+
+@pytest.mark.parametrize(("url", "blocked"), [
+    ("https://x/static/logo.PNG", True),
+    ("https://x/fonts/a.woff2?v=3", True),
+    ("https://x/ad/video.mp4#t=1", True),
+    ("https://x/get_file_url.php?f=cover.png", False),
+    ("https://x/get_down_url.php", False),
+    ("https://x/js/app.js", False),
+    ("https://x/css/main.css", False),
+    ("https://x/f/123-456", False),
+])
+def test_heavy_resource_route_only_matches_static_assets(url, blocked):
+    assert bool(_HEAVY_RESOURCE_URL_RE.search(url)) is blocked
@@ -0,0 +1,51 @@
+"""命令行解析：全局选项的各种写法"""
+
+from __future__ import annotations
+
+import pytest
+
+from ebook_downloader.cli import build_parser
+
+
+def _parse(argv: list[str]):
+    return build_parser(argv).parse_args(argv)
+
+
+@pytest.mark.parametrize(
+    "argv",
+    [
+        ["download", "-c", "x"],
+        ["-C", "cfg.yaml", "download", "-c", "x"],
+        ["--config", "cfg.yaml", "download", "-c", "x"],
+        ["--config=cfg.yaml", "download", "-c", "x"],
+        ["-Ccfg.yaml", "download", "-c", "x"],
+        ["-v", "-C", "cfg.yaml", "download", "-c", "x"],
+        ["-vC", "cfg.yaml", "download", "-c", "x"],
+        ["--conf", "cfg.yaml", "download", "-c", "x"],
+        ["--verb", "--conf=cfg.yaml", "download", "-c", "x"],
+    ],
+)
+def test_download_args_with_global_options(argv):
+    args = _parse(argv)
+    assert args.command == "download"
+    assert args.categories == ["x"]
+    if "cfg.yaml" in " ".join(argv):
+        assert args.config == "cfg.yaml"
+
+
+def test_config_value_named_like_a_command():
+    args = _parse(["-C", "download", "list", "-n", "5"])
+    assert args.config == "download"
+    assert args.command == "list"
+    assert args.limit == 5
+
+
+def test_list_args_after_combined_short_options():
+    args = _parse(["-vC", "cfg.yaml", "list", "--categories"])
+    assert args.verbose
+    assert args.command == "list"
+    assert args.categories is True
+
+
+def test_no_command():
+    assert _parse([]).command is None
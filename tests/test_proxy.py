@@ -0,0 +1,56 @@
+"""ProxyPool 文件模式：冷却期与轮次"""
+
+from __future__ import annotations
+
+import asyncio
+
+from ebook_downloader import proxy as proxy_mod
+from ebook_downloader.proxy import ProxyPool
+
+
+def _pool(tmp_path, monkeypatch, ttl: float) -> ProxyPool:
+    proxy_file = tmp_path / "proxy.txt"
+    proxy_file.write_text("1.1.1.1:80\n2.2.2.2:80\n", encoding="utf-8")
+    monkeypatch.setattr(proxy_mod, "_RECENT_BAD_TTL", ttl)
+
+    async def verify_all(proxies: list[str]) -> list[str]:
+        return list(proxies)
+
+    monkeypatch.setattr(proxy_mod, "_verify_proxies", verify_all)
+    return ProxyPool(proxy_file=proxy_file)
+
+
+async def _burn_all(pool: ProxyPool) -> None:
+    """取出并作废文件中的全部代理"""
+    for _ in range(2):
+        assert await pool.get_proxy() is not None
+        await pool.invalidate()
+
+
+def test_waits_for_cooldown_instead_of_falling_back_to_direct(tmp_path, monkeypatch):
+    pool = _pool(tmp_path, monkeypatch, ttl=0.3)
+
+    async def main() -> tuple[str | None, float]:
+        await _burn_all(pool)
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        proxy = await pool.get_proxy()
+        return proxy, loop.time() - start
+
+    proxy, waited = asyncio.run(main())
+    assert proxy is not None
+    assert waited >= 0.2
+    assert pool._file_round == 2
+
+
+def test_round_advances_once_per_refill_under_concurrency(tmp_path, monkeypatch):
+    pool = _pool(tmp_path, monkeypatch, ttl=0.2)
+
+    async def main() -> list[str | None]:
+        await _burn_all(pool)
+        return await asyncio.gather(*(pool.get_proxy() for _ in range(10)))
+
+    results = asyncio.run(main())
+    assert all(results)
+    assert pool._file_round == 2
+    assert not pool._file_exhausted
@@ -0,0 +1,124 @@
+"""StateDB 写回队列：取消与关闭"""
+
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from ebook_downloader.models import DownloadRecord, DownloadStatus
+from ebook_downloader.state import StateDB
+
+
+def _record(
+    uid: str, status: DownloadStatus = DownloadStatus.COMPLETED, file_size: int = 1,
+) -> DownloadRecord:
+    return DownloadRecord(
+        book_uid=uid, title=uid, author="", category="", link=f"https://x/f/{uid}",
+        status=status, file_size=file_size,
+    )
+
+
+async def _reopen_get(db_path, uid: str) -> DownloadRecord | None:
+    state = StateDB(db_path)
+    await state.open()
+    try:
+        return await state.get(uid)
+    finally:
+        await state.close()
+
+
+def _cancel_after(state: StateDB, sql: str) -> None:
+    """让指定语句在连接线程中执行完成后，await 方收到取消"""
+    db = state.db
+    execute = db.execute
+
+    async def wrapped(statement, *args, **kwargs):
+        result = await execute(statement, *args, **kwargs)
+        if statement == sql:
+            db.execute = execute
+            raise asyncio.CancelledError
+        return result
+
+    db.execute = wrapped
+
+
+@pytest.mark.parametrize("sql", ["BEGIN IMMEDIATE", "COMMIT"])
+def test_close_after_writer_cancelled_mid_flush(tmp_path, sql):
+    db_path = tmp_path / "state.db"
+
+    async def main() -> None:
+        state = StateDB(db_path)
+        await state.open()
+        _cancel_after(state, sql)
+        await state.upsert(_record("a"))
+        # 等写回任务进入 flush 并被取消
+        await asyncio.wait({state._writer_task}, timeout=5)
+        assert state._writer_task.done()
+        await asyncio.wait_for(state.close(), timeout=5)
+
+    asyncio.run(main())
+    record = asyncio.run(_reopen_get(db_path, "a"))
+    assert record is not None
+    assert record.status is DownloadStatus.COMPLETED
+
+
+@pytest.mark.parametrize("yields", range(0, 12))
+def test_close_after_flush_cancelled_at_any_point(tmp_path, yields):
+    db_path = tmp_path / "state.db"
+
+    async def main() -> None:
+        state = StateDB(db_path)
+        await state.open()
+        await state.upsert(_record("a"))
+        flush = asyncio.create_task(state.flush())
+        for _ in range(yields):
+            await asyncio.sleep(0)
+        flush.cancel()
+        await asyncio.wait({flush})
+        await asyncio.wait_for(state.close(), timeout=5)
+
+    asyncio.run(main())
+    assert asyncio.run(_reopen_get(db_path, "a")) is not None
+
+
+def test_close_flushes_pending_without_waiting_interval(tmp_path):
+    db_path = tmp_path / "state.db"
+
+    async def main() -> None:
+        state = StateDB(db_path)
+        await state.open()
+        await state.upsert(_record("a", DownloadStatus.FAILED))
+        await asyncio.wait_for(state.close(), timeout=1)
+
+    asyncio.run(main())
+    record = asyncio.run(_reopen_get(db_path, "a"))
+    assert record is not None
+    assert record.status is DownloadStatus.FAILED
+
+
+def test_total_size_sums_completed_rows_and_tracks_session_upserts(tmp_path):
+    db_path = tmp_path / "state.db"
+
+    async def seed() -> None:
+        state = StateDB(db_path)
+        await state.open()
+        await state.upsert_many([
+            _record("a", file_size=100), _record("b", DownloadStatus.FAILED, 7),
+        ])
+        await state.close()
+
+    async def main() -> tuple[int, int, int]:
+        state = StateDB(db_path)
+        await state.open()
+        try:
+            initial = await state.total_size()
+            await state.upsert(_record("c", file_size=20))
+            added = await state.total_size()
+            await state.upsert(_record("c", file_size=30))
+            return initial, added, await state.total_size()
+        finally:
+            await state.close()
+
+    asyncio.run(seed())
+    assert asyncio.run(main()) == (100, 120, 130)